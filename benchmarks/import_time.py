@@ -0,0 +1,66 @@
+"""
+Import-time benchmark for `libb`.
+
+Each measurement runs in a fresh interpreter so nothing is already cached
+in `sys.modules`. Also checks that importing `LIBBmodel` does not load the
+heavy optional dependencies, which should only load on first use.
+
+Usage:
+    python benchmarks/import_time.py [--runs 5] [--max-seconds 2.0]
+
+Exits with status 1 if a heavy dependency is imported eagerly or the median
+`from libb import LIBBmodel` time exceeds `--max-seconds`.
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+
+# must not be imported by `from libb import LIBBmodel`
+LAZY_MODULES = ["matplotlib", "yfinance", "pysentiment2", "pandas_market_calendars"]
+
+STATEMENTS = {
+    "import libb": "import libb",
+    "from libb import LIBBmodel": "from libb import LIBBmodel",
+}
+
+_PROBE = """
+import json, sys, time
+started = time.perf_counter()
+exec({statement!r})
+elapsed = time.perf_counter() - started
+print(json.dumps({{"seconds": elapsed, "loaded": [m for m in {lazy!r} if m in sys.modules]}}))
+"""
+
+def measure(statement: str) -> dict:
+    code = _PROBE.format(statement=statement, lazy=LAZY_MODULES)
+    result = subprocess.run([sys.executable, "-c", code], cwd=REPO_ROOT, capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--max-seconds", type=float, default=None,
+                        help="fail if the median LIBBmodel import takes longer than this")
+    args = parser.parse_args()
+
+    failed = False
+    for label, statement in STATEMENTS.items():
+        samples = [measure(statement) for _ in range(args.runs)]
+        median = statistics.median(sample["seconds"] for sample in samples)
+        loaded = sorted({module for sample in samples for module in sample["loaded"]})
+        print(f"{label:<30} median {median * 1000:8.1f} ms over {args.runs} runs")
+        if loaded:
+            print(f"  eagerly imported: {', '.join(loaded)}")
+            failed = True
+        if label == "from libb import LIBBmodel" and args.max_seconds is not None and median > args.max_seconds:
+            print(f"  slower than the {args.max_seconds:.2f}s budget")
+            failed = True
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
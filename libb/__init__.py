@@ -1,5 +1,15 @@
-from libb.model import LIBBmodel
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from libb.model import LIBBmodel
 
 __all__ = [
     "LIBBmodel",
 ]
+
+def __getattr__(name: str):
+    # `import libb` stays cheap; the model and its dependencies load on first access
+    if name == "LIBBmodel":
+        from libb.model import LIBBmodel
+        return LIBBmodel
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,13 +1,15 @@
 from typing import cast
 
+import numpy as np
 import pandas as pd
 import math
 
 from libb.other.types_file import Order, TradeStatus
-from libb.execution.utils import append_log, is_nyse_open, order_to_trade_schema
+from libb.execution.utils import LogBuffer, append_log, is_nyse_open, order_to_trade_schema, set_log_buffer
 from libb.execution.process_order import process_order
-from libb.execution.get_market_data import download_data_on_given_date
-from libb.execution.portfolio_editing import reduce_position
+from libb.execution.get_market_data import download_data_for_tickers, download_price_panel, history_to_snapshot
+from libb.execution.market_cache import MarketSnapshotCache, set_snapshot_cache
+from libb.core.storage import write_table
 
 from typing import Tuple
 from datetime import date
@@ -38,6 +40,39 @@ class Processing:
         self.skipped_orders = 0;
         self.failed_orders = 0;
 
+        self.snapshot_cache = MarketSnapshotCache()
+        # trade log and position history rows are written once, when the run commits
+        self.log_buffer = LogBuffer([_trade_log_path, _position_history_path])
+
+# ----------------------------------
+# Step 0: Prefetch Market Data
+# ----------------------------------
+
+    def _prefetch_market_data(self, pending_trades: dict[str, list[dict]]) -> None:
+        """Download every held ticker and every ticker with an order for today in one batch,
+        seeding the run-scoped snapshot cache. Tickers that fail are fetched individually later."""
+        tickers = set()
+        if not self.portfolio.empty:
+            tickers.update(str(ticker).upper() for ticker in self.portfolio["ticker"])
+        for order in pending_trades.get("orders", []):
+            ticker = order.get("ticker")
+            if not isinstance(ticker, str) or order.get("action") not in ("b", "s"):
+                continue
+            try:
+                order_date = pd.Timestamp(order["date"]).date()
+            except Exception:
+                continue
+            if order_date == self.run_date:
+                tickers.add(ticker.upper())
+        if not tickers:
+            return
+
+        histories = download_data_for_tickers(sorted(tickers), self.run_date, self.run_date)
+        for ticker, data in histories.items():
+            try:
+                self.snapshot_cache.put(ticker, self.run_date, history_to_snapshot(ticker, data))
+            except TypeError as e:
+                print(f"Skipping prefetched data for {ticker}: {e}")
 
 # ----------------------------------
 # Step 1: Process Orders
@@ -103,39 +138,48 @@ class Processing:
 # ----------------------------------    
     
     def _check_stoplosses(self):
+        """Sell every position whose stop loss was hit on the run date, in one batch.
+        The fill is the open if the price gapped below the stop, otherwise the stop itself."""
         if self.portfolio.empty:
             return
-        for i, row in self.portfolio.iterrows():
-            ticker = row["ticker"]
-            shares = row["shares"]
-            ticker_data = download_data_on_given_date(row["ticker"], self.run_date)
-            open_price = ticker_data["Open"]
-            low = ticker_data["Low"]
-            stoploss = row["stop_loss"]
+        panel = download_price_panel(self.portfolio["ticker"].tolist(), self.run_date)
+        open_prices = panel["Open"].to_numpy(dtype=float)
+        lows = panel["Low"].to_numpy(dtype=float)
+        stoplosses = self.portfolio["stop_loss"].to_numpy(dtype=float)
+
+        # NaN stop losses never trigger
+        triggered = lows <= stoplosses
+        if not triggered.any():
+            return
 
-            if low <= stoploss:
-            
-                fill_price = open_price if open_price <= stoploss else stoploss
-                proceeds = shares * fill_price
-                self.portfolio, buy_price = reduce_position(self.portfolio, ticker, shares)
-                self.cash += proceeds
-                pnl = proceeds - (buy_price * shares)
+        sold = self.portfolio.loc[triggered]
+        shares = sold["shares"].to_numpy()
+        fill_prices = np.where(open_prices[triggered] <= stoplosses[triggered],
+                               open_prices[triggered], stoplosses[triggered])
+        proceeds = shares * fill_prices
+        pnl = proceeds - sold["buy_price"].to_numpy(dtype=float) * shares
 
-                order: Order = {"action": "s",
-                                "ticker": ticker,
-                                "shares": shares,
-                                "order_type": "STOPLOSS_MET",
-                                "limit_price": math.nan,
-                                "time_in_force": "",
-                                "date": str(self.run_date),
-                                "stop_loss": stoploss,
-                                "rationale": "",
-                                "confidence": math.nan,
-                                }
-                
-                trade_dict = order_to_trade_schema(order, executed_price=fill_price, PnL=pnl,
-                                           status="FILLED", reason="")
-                append_log(self._trade_log_path, trade_dict)
+        self.portfolio = self.portfolio.loc[~triggered].reset_index(drop=True)
+        self.cash += float(proceeds.sum())
+
+        trades = []
+        for ticker, share_count, stoploss, fill_price, trade_pnl in zip(
+                sold["ticker"], shares.tolist(), stoplosses[triggered].tolist(), fill_prices.tolist(), pnl.tolist()):
+            order: Order = {"action": "s",
+                            "ticker": ticker,
+                            "shares": share_count,
+                            "order_type": "STOPLOSS_MET",
+                            "limit_price": math.nan,
+                            "time_in_force": "",
+                            "date": str(self.run_date),
+                            "stop_loss": stoploss,
+                            "rationale": "",
+                            "confidence": math.nan,
+                            }
+            trades.append(order_to_trade_schema(order, executed_price=fill_price, PnL=trade_pnl,
+                                                status="FILLED", reason=""))
+        # all STOPLOSS_MET rows go to the trade log in one write
+        append_log(self._trade_log_path, pd.DataFrame(trades))
         return
 
 # ----------------------------------
@@ -146,7 +190,7 @@ class Processing:
         """Update market portfolio value and cash. Save new values to disk."""
         self.update_market_value_columns()
 
-        self.portfolio.to_csv(self._portfolio_path, index=False)
+        write_table(self.portfolio, self._portfolio_path)
         
         required_cols = [
             "ticker",
@@ -164,23 +208,15 @@ class Processing:
         return
     
     def update_market_value_columns(self):
+        """Mark every position to the run date's close in one batch."""
+        if self.portfolio.empty:
+            return
+        closes = download_price_panel(self.portfolio["ticker"].tolist(), self.run_date)["Close"].to_numpy()
+        market_value = (closes * self.portfolio["shares"].to_numpy()).round(2)
 
-        for i, row in self.portfolio.iterrows():
-            ticker = row["ticker"]
-            shares = row["shares"]
-            cost_basis = self.portfolio.at[i, "cost_basis"]
-            
-            value = self.portfolio.at[i, "market_value"]
-
-            value = cast(float, value)
-            cost = cast(float, cost_basis)
-
-            ticker_data = download_data_on_given_date(ticker, self.run_date)
-            close_price = ticker_data["Close"]
-
-            self.portfolio.at[i, "market_price"] = close_price
-            self.portfolio.at[i, "market_value"] = round(close_price * shares, 2)
-            self.portfolio.at[i, "unrealized_pnl"] = round(value - cost, 2)
+        self.portfolio["market_price"] = closes
+        self.portfolio["market_value"] = market_value
+        self.portfolio["unrealized_pnl"] = (market_value - self.portfolio["cost_basis"].to_numpy(dtype=float)).round(2)
     
 # ----------------------------------
 # Step 4: Append Disk History
@@ -235,11 +271,25 @@ class Processing:
 # ----------------------------------
 
     def processing(self, pending_trades: dict[str, list[dict]]) -> dict[str, list[dict]]:
-        unexecuted_trades = self._process_orders(pending_trades)
-        self._check_stoplosses()
-        self._update_portfolio_market_data()
-        self._append_portfolio_history()
-        self._append_position_history()
+        # share one market snapshot per (ticker, date) across all stages of the run
+        set_snapshot_cache(self.snapshot_cache)
+        set_log_buffer(self.log_buffer)
+        try:
+            self._prefetch_market_data(pending_trades)
+            unexecuted_trades = self._process_orders(pending_trades)
+            self._check_stoplosses()
+            self._update_portfolio_market_data()
+            self._append_portfolio_history()
+            self._append_position_history()
+            set_log_buffer(None)
+            self.log_buffer.flush()
+        except Exception:
+            # nothing buffered has reached disk yet
+            self.log_buffer.discard()
+            raise
+        finally:
+            set_log_buffer(None)
+            set_snapshot_cache(None)
 
         return unexecuted_trades
     
@@ -249,6 +299,10 @@ class Processing:
     
     def get_order_status_count(self) -> Tuple[int, int, int]:
         return self.filled_orders, self.failed_orders, self.skipped_orders
+
+    def get_snapshot_cache_stats(self) -> Tuple[int, int]:
+        "Return (hits, misses) of the run-scoped market snapshot cache."
+        return self.snapshot_cache.stats()
     
     def get_portfolio(self) -> pd.DataFrame:
         return self.portfolio
@@ -1,6 +1,7 @@
 from pathlib import Path
 import pandas as pd
-from libb.other.types_file import ModelSnapshot, DiskLayout
+from libb.other.types_file import IncrementalSnapshot, ModelSnapshot, DiskLayout
+from libb.core.storage import read_document, read_records, read_table, read_typed_table
 import json
 
 class DiskReader:
@@ -13,10 +14,12 @@ class DiskReader:
     # ----------------------------------
 
     def load_csv(self, path: Path) -> pd.DataFrame:
-        """Helper for loading CSV at a given path. Return empty DataFrame for invalid paths."""
-        if path.exists():
-            return pd.read_csv(path)
-        return pd.DataFrame()
+        """Helper for loading a portfolio table (CSV, Parquet or Arrow) at a given path. Return empty DataFrame for invalid paths."""
+        return read_table(path)
+
+    def load_typed(self, path: Path, table: str, categories: bool = True) -> pd.DataFrame:
+        """Helper for loading a portfolio table with its explicit schema (see `libb.core.storage.TABLE_SCHEMAS`)."""
+        return read_typed_table(path, table, categories=categories)
 
     def load_json(self, path: Path) -> list[dict]:
         """Helper for loading JSON files at a given path. Return empty list for invalid paths."""
@@ -25,15 +28,17 @@ class DiskReader:
                 return json.load(f)
         return []
 
+    def load_records(self, path: Path, last: int | None = None) -> list[dict]:
+        """Helper for loading a metrics history, optionally only its last `last` records."""
+        return read_records(path, last)
+
     def load_orders_dict(self, path: Path) -> dict[str, list[dict]]:
-        if path.exists():
-            with open(path, "r") as f:
-                return json.load(f)
-        return {"orders": []}
+        return read_document(path, {"orders": []})
 
     def load_cash(self) -> float:
-        with open(self.layout.cash_path, "r") as f:
-            data = json.load(f)
+        data = read_document(self.layout.cash_path)
+        if data is None:
+            raise FileNotFoundError(f"No cash record found at {self.layout.cash_path}")
 
         if "cash" not in data:
             raise RuntimeError(
@@ -53,14 +58,19 @@ class DiskReader:
     # Snapshot Behavior
     # ----------------------------------
 
-    def save_disk_snapshot(self) -> ModelSnapshot:
+    def save_disk_snapshot(self) -> ModelSnapshot | IncrementalSnapshot:
         """
         Capture a snapshot of the last committed on-disk model state.
 
         This snapshot reflects persisted state only and is used for rollback
         after processing failures. In-memory runtime mutations that have not
         been flushed to disk are intentionally excluded.
+
+        CSV runs get an `IncrementalSnapshot`; Parquet and Arrow tables are
+        rewritten on append, so those runs get a full `ModelSnapshot`.
         """
+        if self.layout.storage_backend == "csv":
+            return self.save_incremental_snapshot()
         return ModelSnapshot(
             cash=self.load_cash(),
 
@@ -69,8 +79,13 @@ class DiskReader:
             trade_log=self.load_csv(self.layout.trade_log_path),
             position_history=self.load_csv(self.layout.position_history_path),
             pending_trades=self.load_orders_dict(self.layout.pending_trades_path),
+        )
 
-            performance=self.load_json(self.layout.performance_path),
-            behavior=self.load_json(self.layout.behavior_path),
-            sentiment=self.load_json(self.layout.sentiment_path),
+    def save_incremental_snapshot(self) -> IncrementalSnapshot:
+        """Record the append-only CSV tables by length and copy the files processing rewrites."""
+        rewritten = [self.layout.cash_path, self.layout.portfolio_path, self.layout.pending_trades_path]
+        append_only = [self.layout.portfolio_history_path, self.layout.trade_log_path, self.layout.position_history_path]
+        return IncrementalSnapshot(
+            file_contents={path: path.read_bytes() if path.exists() else None for path in rewritten},
+            file_lengths={path: path.stat().st_size for path in append_only if path.exists()},
         )
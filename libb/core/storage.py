@@ -0,0 +1,790 @@
+import csv
+import importlib.util
+import io
+import json
+import os
+import sqlite3
+from contextlib import contextmanager
+from datetime import date
+from pathlib import Path
+
+import pandas as pd
+
+# ----------------------------------
+# Table Definitions
+# ----------------------------------
+
+STORAGE_BACKENDS = {"csv": ".csv", "parquet": ".parquet", "arrow": ".arrow", "sqlite": ".sqlite3"}
+
+# with the sqlite backend every table and document of a run lives in this database
+SQLITE_FILE_NAME = "ledger.sqlite3"
+
+TABLE_COLUMNS: dict[str, list[str]] = {
+    "portfolio": ["ticker", "shares", "buy_price", "cost_basis", "stop_loss", "market_price", "market_value",
+                  "unrealized_pnl"],
+    "portfolio_history": ["date", "equity", "cash", "positions_value", "daily_return_pct", "overall_return_pct"],
+    "trade_log": ["date", "ticker", "action", "order_type", "shares", "limit_price", "executed_price", "stop_loss",
+                  "cost_basis", "PnL", "rationale", "confidence", "status", "reason"],
+    "position_history": ["date", "ticker", "shares", "avg_cost", "stop_loss", "market_price", "market_value",
+                         "unrealized_pnl"],
+}
+
+# JSON state kept next to the tables (a file each, or a row of the sqlite state table)
+DOCUMENTS = ("cash", "pending_trades")
+
+# columns stored as text in the typed backends; every other known column is numeric
+TEXT_COLUMNS = {"date", "ticker", "action", "order_type", "rationale", "status", "reason"}
+
+# low-cardinality text columns, held as `category` by typed reads
+CATEGORY_COLUMNS = {"ticker", "action", "order_type", "status"}
+
+def _column_kind(col: str) -> str:
+    if col == "date":
+        return "date"
+    if col in CATEGORY_COLUMNS:
+        return "category"
+    if col in TEXT_COLUMNS:
+        return "text"
+    if col == "shares":
+        return "int"
+    return "float"
+
+# explicit column kinds per ledger table: date, category, text, int or float
+TABLE_SCHEMAS: dict[str, dict[str, str]] = {
+    table: {col: _column_kind(col) for col in columns} for table, columns in TABLE_COLUMNS.items()
+}
+
+def table_file_name(table: str, storage_backend: str) -> str:
+    """
+    File name of a ledger table, relative to the portfolio directory.
+
+    For the sqlite backend this is an address inside the database,
+    `ledger.sqlite3/<table>`, which every function in this module accepts
+    in place of a file path.
+    """
+    if storage_backend not in STORAGE_BACKENDS:
+        raise RuntimeError(f"Unknown storage backend {storage_backend!r}. Expected one of {sorted(STORAGE_BACKENDS)}.")
+    if storage_backend == "sqlite":
+        return f"{SQLITE_FILE_NAME}/{table}"
+    return f"{table}{STORAGE_BACKENDS[storage_backend]}"
+
+def document_file_name(name: str, storage_backend: str) -> str:
+    """File name of a JSON document (see `DOCUMENTS`), relative to the portfolio directory."""
+    if storage_backend == "sqlite":
+        return f"{SQLITE_FILE_NAME}/{name}"
+    return f"{name}.json"
+
+def _require_pyarrow(path: Path) -> None:
+    if importlib.util.find_spec("pyarrow") is None:
+        raise RuntimeError(f"Reading or writing {path.name} requires `pyarrow`. Install it or use the csv storage backend.")
+
+def _as_text(values: pd.Series) -> pd.Series:
+    # empty strings become nulls, as they do when a CSV is read back
+    return values.map(lambda value: None if pd.isna(value) or value == "" else str(value)).astype(object)
+
+def _typed(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Give ledger columns stable types so appends never change a column's schema.
+    A numeric column holding text that is not a number (e.g. confidence="MISSING"
+    on rejected orders) is stored as text instead, so no value is lost.
+    """
+    df = df.copy()
+    for col in df.columns:
+        if col in TEXT_COLUMNS:
+            df[col] = _as_text(df[col])
+        elif any(col in columns for columns in TABLE_COLUMNS.values()):
+            numeric = pd.to_numeric(df[col], errors="coerce")
+            blank = df[col].isna() | (df[col].astype(object) == "")
+            df[col] = numeric if (numeric.notna() | blank).all() else _as_text(df[col])
+    return df
+
+# ----------------------------------
+# Atomic Writes
+# ----------------------------------
+
+# directories whose fsync is deferred to the end of the open commit group (see `commit_group()`)
+_pending_directory_syncs: set[Path] | None = None
+
+def _temp_path(path: Path) -> Path:
+    return path.with_name(path.name + f".{os.getpid()}.tmp")
+
+def _sync_directory(directory: Path) -> None:
+    """fsync a directory so a rename inside it survives a crash. Skipped where directories cannot be opened (Windows)."""
+    if _pending_directory_syncs is not None:
+        _pending_directory_syncs.add(directory)
+        return
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+def _replace_durably(tmp_path: Path, path: Path) -> None:
+    """fsync a fully written temp file and rename it over `path`."""
+    with open(tmp_path, "rb+") as f:
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    _sync_directory(path.parent)
+
+def atomic_write(path: Path | str, data: str | bytes) -> None:
+    """
+    Replace `path` with `data` so that a crash leaves either the old or the
+    new contents, never a truncated file: the data goes to a temp file in
+    the same directory, is fsynced, and is renamed over the target.
+    """
+    path = Path(path)
+    tmp_path = _temp_path(path)
+    try:
+        if isinstance(data, bytes):
+            tmp_path.write_bytes(data)
+        else:
+            tmp_path.write_text(data, encoding="utf-8", newline="")
+        _replace_durably(tmp_path, path)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+
+@contextmanager
+def commit_group():
+    """
+    Batch the directory fsyncs of every `atomic_write()` in the block into
+    one fsync per directory when the block exits. File contents are still
+    fsynced before each rename. Nested groups join the outer one.
+    """
+    global _pending_directory_syncs
+    if _pending_directory_syncs is not None:
+        yield
+        return
+    _pending_directory_syncs = set()
+    try:
+        yield
+    finally:
+        directories, _pending_directory_syncs = _pending_directory_syncs, None
+        for directory in directories:
+            _sync_directory(directory)
+
+# ----------------------------------
+# SQLite Engine
+# ----------------------------------
+
+STATE_TABLE = "state"
+
+# database path -> connection of the transaction open on it (see `transaction()`)
+_open_transactions: dict[Path, sqlite3.Connection] = {}
+
+def _sqlite_address(path: Path | str) -> tuple[Path, str] | None:
+    """(database path, table or document name) for a sqlite address, None for a plain file."""
+    path = Path(path)
+    if path.parent.suffix == STORAGE_BACKENDS["sqlite"]:
+        return path.parent, path.name
+    return None
+
+def _column_type(col: str) -> str:
+    if col in TEXT_COLUMNS:
+        return "TEXT"
+    if col == "shares":
+        return "INTEGER"
+    return "REAL"
+
+@contextmanager
+def _sqlite_connection(db_path: Path, immediate: bool = False):
+    """
+    Yield the connection of the transaction open on `db_path`, or a new
+    connection whose statements commit together when the block exits.
+    """
+    active = _open_transactions.get(db_path)
+    if active is not None:
+        yield active
+        return
+
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    connection = sqlite3.connect(db_path, isolation_level=None)
+    try:
+        connection.execute("BEGIN IMMEDIATE" if immediate else "BEGIN")
+        connection.execute(f'CREATE TABLE IF NOT EXISTS "{STATE_TABLE}" (key TEXT PRIMARY KEY, value TEXT NOT NULL)')
+        yield connection
+        connection.execute("COMMIT")
+    except BaseException:
+        if connection.in_transaction:
+            connection.execute("ROLLBACK")
+        raise
+    finally:
+        connection.close()
+
+def _sqlite_columns(connection: sqlite3.Connection, table: str) -> list[str]:
+    return [row[1] for row in connection.execute(f'PRAGMA table_info("{table}")')]
+
+def _create_sqlite_table(connection: sqlite3.Connection, table: str, columns: list[str]) -> None:
+    definitions = ", ".join(f'"{col}" {_column_type(col)}' for col in columns)
+    connection.execute(f'CREATE TABLE IF NOT EXISTS "{table}" ({definitions})')
+    for col in ("date", "ticker"):
+        if col in columns:
+            connection.execute(f'CREATE INDEX IF NOT EXISTS "{table}_{col}" ON "{table}" ("{col}")')
+
+def _insert_sqlite_rows(connection: sqlite3.Connection, table: str, df: pd.DataFrame) -> None:
+    if df.empty:
+        return
+    df = _typed(df).astype(object)
+    df = df.where(df.notna(), None)
+    names = ", ".join(f'"{col}"' for col in df.columns)
+    placeholders = ", ".join("?" for _ in df.columns)
+    connection.executemany(f'INSERT INTO "{table}" ({names}) VALUES ({placeholders})',
+                           df.itertuples(index=False, name=None))
+
+@contextmanager
+def transaction(path: Path | str):
+    """
+    Group every read and write to the sqlite database holding `path` into
+    one transaction: all of it commits when the block exits, none of it if
+    the block raises. Nested blocks join the outer transaction.
+
+    For the file backends this is a no-op; their callers roll back from a
+    disk snapshot instead.
+    """
+    address = _sqlite_address(path)
+    if address is None or address[0] in _open_transactions:
+        yield
+        return
+    db_path = address[0]
+    with _sqlite_connection(db_path, immediate=True) as connection:
+        _open_transactions[db_path] = connection
+        try:
+            yield
+        finally:
+            _open_transactions.pop(db_path, None)
+
+# ----------------------------------
+# Table Access
+# ----------------------------------
+
+def read_table(path: Path | str) -> pd.DataFrame:
+    """Read a ledger table in any storage format. Returns an empty DataFrame for missing paths."""
+    path = Path(path)
+    address = _sqlite_address(path)
+    if address is not None:
+        db_path, table = address
+        if not db_path.exists():
+            return pd.DataFrame()
+        with _sqlite_connection(db_path) as connection:
+            if not _sqlite_columns(connection, table):
+                return pd.DataFrame()
+            return pd.read_sql_query(f'SELECT * FROM "{table}" ORDER BY rowid', connection)
+    if not path.exists():
+        return pd.DataFrame()
+    match path.suffix:
+        case ".csv":
+            return pd.read_csv(path)
+        case ".parquet":
+            _require_pyarrow(path)
+            return pd.read_parquet(path)
+        case ".arrow":
+            _require_pyarrow(path)
+            return pd.read_feather(path)
+        case _:
+            raise RuntimeError(f"Unsupported table format: {path}")
+
+def apply_table_schema(df: pd.DataFrame, table: str, float_dtype: str = "float64", int_dtype: str = "int64",
+                       categories: bool = True) -> pd.DataFrame:
+    """
+    Cast a ledger table to the dtypes in `TABLE_SCHEMAS`: `date` becomes
+    datetime64, ticker/action/order_type/status become `category` (plain
+    strings with `categories=False`, for frames that gain new tickers), and
+    numeric columns use `float_dtype` / `int_dtype`. Values that are not
+    numbers (e.g. `confidence="MISSING"` on rejected orders) become NaN.
+    Integer columns only get `int_dtype` when every value is a whole
+    number, and fall back to `float_dtype` otherwise. Columns outside the
+    schema are left as they are.
+    """
+    schema = TABLE_SCHEMAS[table]
+    df = df.copy()
+    for col in df.columns:
+        kind = schema.get(col)
+        if kind == "date":
+            if not pd.api.types.is_datetime64_any_dtype(df[col]):
+                df[col] = pd.to_datetime(df[col], errors="coerce", format="ISO8601")
+        elif kind == "category" and categories:
+            df[col] = df[col].astype("category")
+        elif kind in ("category", "text"):
+            df[col] = df[col].astype(object)
+        elif kind == "int":
+            values = pd.to_numeric(df[col], errors="coerce").astype("float64")
+            whole = values.notna().all() and (values == values.round()).all()
+            df[col] = values.astype(int_dtype if whole else float_dtype)
+        elif kind == "float":
+            df[col] = pd.to_numeric(df[col], errors="coerce").astype(float_dtype)
+    return df
+
+def read_typed_table(path: Path | str, table: str, float_dtype: str = "float64", int_dtype: str = "int64",
+                     categories: bool = True) -> pd.DataFrame:
+    """
+    Read a ledger table with the explicit dtypes of `apply_table_schema()`.
+    CSV files get the category dtypes at parse time. Numeric columns are
+    converted afterwards, because rejected orders can hold text in them.
+    """
+    path = Path(path)
+    if path.suffix != ".csv" or not path.exists():
+        df = read_table(path)
+    else:
+        dtypes = {}
+        if categories:
+            dtypes = {col: "category" for col, kind in TABLE_SCHEMAS[table].items() if kind == "category"}
+        df = pd.read_csv(path, dtype=dtypes)
+    return apply_table_schema(df, table, float_dtype, int_dtype, categories)
+
+def write_table(df: pd.DataFrame, path: Path | str) -> None:
+    """Replace a ledger table with `df`."""
+    path = Path(path)
+    address = _sqlite_address(path)
+    if address is not None:
+        db_path, table = address
+        with _sqlite_connection(db_path) as connection:
+            connection.execute(f'DROP TABLE IF EXISTS "{table}"')
+            _create_sqlite_table(connection, table, [str(col) for col in df.columns])
+            _insert_sqlite_rows(connection, table, df.reset_index(drop=True))
+        return
+    match path.suffix:
+        case ".csv":
+            atomic_write(path, df.to_csv(header=True, index=False))
+        case ".parquet" | ".arrow":
+            _require_pyarrow(path)
+            tmp_path = _temp_path(path)
+            typed = _typed(df.reset_index(drop=True))
+            if path.suffix == ".parquet":
+                typed.to_parquet(tmp_path, index=False)
+            else:
+                typed.to_feather(tmp_path)
+            _replace_durably(tmp_path, path)
+        case _:
+            raise RuntimeError(f"Unsupported table format: {path}")
+
+def create_table(path: Path | str, columns: list[str]) -> None:
+    """Create an empty table with the given columns unless one already exists."""
+    path = Path(path)
+    address = _sqlite_address(path)
+    if address is not None:
+        db_path, table = address
+        with _sqlite_connection(db_path) as connection:
+            _create_sqlite_table(connection, table, columns)
+        return
+    if path.exists():
+        return
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if path.suffix == ".csv":
+        atomic_write(path, ",".join(columns) + "\n")
+    else:
+        write_table(pd.DataFrame(columns=columns), path)
+
+def append_table(path: Path | str, rows: pd.DataFrame) -> None:
+    """
+    Append rows to a Parquet, Arrow or SQLite table, aligned to its existing columns.
+
+    SQLite inserts the rows. Parquet and Arrow do not support in-place
+    appends, so the table is rewritten; during processing appends are
+    buffered and written once per run (see `libb.execution.utils.LogBuffer`).
+    CSV appends go through `libb.execution.utils.append_log()`.
+    """
+    path = Path(path)
+    address = _sqlite_address(path)
+    if address is not None:
+        db_path, table = address
+        with _sqlite_connection(db_path) as connection:
+            columns = _sqlite_columns(connection, table)
+            if not columns:
+                raise RuntimeError("Schema missing: header not initialized")
+            _insert_sqlite_rows(connection, table, rows.reindex(columns=columns))
+        return
+    existing = read_table(path)
+    if existing.columns.empty:
+        raise RuntimeError("Schema missing: header not initialized")
+    rows = rows.reindex(columns=existing.columns)
+    combined = rows if existing.empty else pd.concat([existing, rows], ignore_index=True)
+    # typed as a whole by write_table(), so a column that turned to text stays one type
+    write_table(combined, path)
+
+def query_table(path: Path | str, start_date: date | str | None = None, end_date: date | str | None = None,
+                ticker: str | None = None) -> pd.DataFrame:
+    """
+    Rows of a ledger table with `date` in [start_date, end_date] and, if
+    given, the given `ticker`. The sqlite backend answers from its date and
+    ticker indexes. CSV tables in `INDEXED_TABLES` with a `start_date` are
+    read through their date offset index (see `read_csv_since()`); other
+    tables are read whole and filtered.
+    """
+    start = str(pd.Timestamp(start_date).date()) if start_date is not None else None
+    end = str(pd.Timestamp(end_date).date()) if end_date is not None else None
+    address = _sqlite_address(path)
+    if address is not None:
+        db_path, table = address
+        if not db_path.exists():
+            return pd.DataFrame()
+        conditions, params = [], []
+        for clause, value in (('"date" >= ?', start), ('"date" <= ?', end), ('"ticker" = ?', ticker)):
+            if value is not None:
+                conditions.append(clause)
+                params.append(value)
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+        with _sqlite_connection(db_path) as connection:
+            if not _sqlite_columns(connection, table):
+                return pd.DataFrame()
+            return pd.read_sql_query(f'SELECT * FROM "{table}"{where} ORDER BY rowid', connection, params=params)
+
+    if is_indexed_table(path) and start is not None:
+        df = read_csv_since(path, start)
+    else:
+        df = read_table(path)
+    if df.empty:
+        return df
+    mask = pd.Series(True, index=df.index)
+    if start is not None or end is not None:
+        dates = pd.to_datetime(df["date"]).dt.strftime("%Y-%m-%d")
+        if start is not None:
+            mask &= dates >= start
+        if end is not None:
+            mask &= dates <= end
+    if ticker is not None:
+        mask &= df["ticker"] == ticker
+    return df[mask].copy()
+
+# ----------------------------------
+# Document Access
+# ----------------------------------
+
+def read_document(path: Path | str, default=None):
+    """Load a JSON document (a file, or a row of the sqlite state table). Returns `default` if it is missing."""
+    path = Path(path)
+    address = _sqlite_address(path)
+    if address is None:
+        if not path.exists():
+            return default
+        with open(path, "r") as f:
+            return json.load(f)
+    db_path, name = address
+    if not db_path.exists():
+        return default
+    with _sqlite_connection(db_path) as connection:
+        row = connection.execute(f'SELECT value FROM "{STATE_TABLE}" WHERE key = ?', (name,)).fetchone()
+    return default if row is None else json.loads(row[0])
+
+def write_document(path: Path | str, data) -> None:
+    """Replace a JSON document."""
+    path = Path(path)
+    address = _sqlite_address(path)
+    if address is None:
+        atomic_write(path, json.dumps(data, indent=2))
+        return
+    db_path, name = address
+    with _sqlite_connection(db_path) as connection:
+        connection.execute(f'INSERT OR REPLACE INTO "{STATE_TABLE}" (key, value) VALUES (?, ?)', (name, json.dumps(data)))
+
+def create_document(path: Path | str, data) -> None:
+    """Create a JSON document with `data` unless one already exists."""
+    path = Path(path)
+    address = _sqlite_address(path)
+    if address is None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if not path.exists():
+            atomic_write(path, json.dumps(data))
+        return
+    db_path, name = address
+    with _sqlite_connection(db_path) as connection:
+        connection.execute(f'INSERT OR IGNORE INTO "{STATE_TABLE}" (key, value) VALUES (?, ?)', (name, json.dumps(data)))
+
+# ----------------------------------
+# Record Logs (JSON Lines)
+# ----------------------------------
+
+def _parse_record_lines(lines: list[bytes]) -> list[dict]:
+    records = []
+    for i, line in enumerate(lines):
+        if not line.strip():
+            continue
+        try:
+            records.append(json.loads(line))
+        except json.JSONDecodeError:
+            # a torn final line from an interrupted append is dropped
+            if i == len(lines) - 1:
+                continue
+            raise
+    return records
+
+def read_records(path: Path | str, last: int | None = None) -> list[dict]:
+    """
+    Load a JSON Lines file of records, oldest first. Returns an empty list
+    for missing files.
+
+    With `last`, only the last `last` records are returned, read from the
+    end of the file in blocks so the cost does not grow with its length.
+    """
+    path = Path(path)
+    if not path.exists():
+        return []
+    if last is None:
+        return _parse_record_lines(path.read_bytes().splitlines())
+    if last <= 0:
+        return []
+
+    block_size = 64 * 1024
+    with open(path, "rb") as f:
+        position = f.seek(0, os.SEEK_END)
+        data = b""
+        # one extra line, since the first one read may be partial
+        while position > 0 and data.count(b"\n") <= last + 1:
+            step = min(block_size, position)
+            position -= step
+            f.seek(position)
+            data = f.read(step) + data
+    lines = data.splitlines()
+    if position > 0:
+        lines = lines[1:]
+    return _parse_record_lines(lines)[-last:]
+
+def append_records(path: Path | str, records: list[dict], fsync: bool = True) -> None:
+    """Append records to a JSON Lines file, one line each, and fsync it unless `fsync` is False."""
+    path = Path(path)
+    text = "".join(json.dumps(record) + "\n" for record in records)
+    path.touch(exist_ok=True)
+    with open(path, "r+b") as f:
+        end = f.seek(0, os.SEEK_END)
+        if end > 0:
+            f.seek(end - 1)
+            if f.read(1) != b"\n":
+                # drop the torn line of an interrupted append
+                f.seek(max(0, end - 64 * 1024))
+                tail = f.read()
+                end = end - len(tail) + tail.rfind(b"\n") + 1 if b"\n" in tail else 0
+                f.truncate(end)
+        f.seek(end)
+        f.write(text.encode("utf-8"))
+        if fsync:
+            f.flush()
+            os.fsync(f.fileno())
+
+def write_records(path: Path | str, records: list[dict]) -> None:
+    """Replace a JSON Lines file with `records`."""
+    atomic_write(path, "".join(json.dumps(record) + "\n" for record in records))
+
+def migrate_json_records(legacy_path: Path | str, path: Path | str) -> bool:
+    """
+    Convert a JSON array file (the format metrics were stored in before
+    JSON Lines) to a JSON Lines file at `path` and remove it. Does nothing
+    if `path` already exists or there is no legacy file. Returns whether a
+    file was migrated.
+    """
+    legacy_path, path = Path(legacy_path), Path(path)
+    if path.exists() or not legacy_path.exists():
+        return False
+    with open(legacy_path, "r") as f:
+        records = json.load(f)
+    if not isinstance(records, list):
+        raise RuntimeError(f"Cannot migrate {legacy_path}: expected a JSON array of records.")
+    write_records(path, records)
+    legacy_path.unlink()
+    return True
+
+# ----------------------------------
+# Date Offset Index (CSV)
+# ----------------------------------
+
+# Each append to a CSV table records one entry in a `<table>.index.jsonl`
+# sidecar: the byte range it wrote, the file's size and mtime afterwards,
+# the min/max `date` of its rows and the max date of all earlier entries
+# (`prior_max`). Rows are not in date order (rejected orders keep their own
+# date), so a look-back query reads the entries from the end and stops at
+# the first one whose `prior_max` is before the cutoff.
+
+# only the execution log is queried by look-back window; the other tables
+# are read whole, so indexing their appends would be wasted work
+INDEXED_TABLES = {"trade_log"}
+
+def is_indexed_table(path: Path | str) -> bool:
+    path = Path(path)
+    return path.suffix == ".csv" and path.stem in INDEXED_TABLES
+
+def _index_path(path: Path) -> Path:
+    return path.with_name(f"{path.stem}.index.jsonl")
+
+def _date_strings(dates) -> pd.Series:
+    return pd.to_datetime(pd.Series(dates, dtype=object), errors="coerce").dropna().dt.strftime("%Y-%m-%d")
+
+def _day_string(value: str) -> str | None:
+    """YYYY-MM-DD for a date cell, without pandas for the common ISO form."""
+    if len(value) >= 10 and value[4] == "-" and value[7] == "-":
+        return value[:10]
+    dates = _date_strings([value or None])
+    return dates.iloc[0] if not dates.empty else None
+
+def record_csv_append(path: Path | str, start: int, dates) -> None:
+    """Index the rows just appended to CSV `path` from byte offset `start` to its end.
+    Tables outside `INDEXED_TABLES` are skipped."""
+    path = Path(path)
+    if not is_indexed_table(path):
+        return
+    stat = os.stat(path)
+    if stat.st_size <= start:
+        return
+    dates = _date_strings(dates)
+    previous = read_records(_index_path(path), last=1)
+    prior_max = None
+    if previous:
+        candidates = [value for value in (previous[0]["prior_max"], previous[0]["max_date"]) if value is not None]
+        prior_max = max(candidates) if candidates else None
+    entry = {
+        "start": start, "end": stat.st_size, "mtime_ns": stat.st_mtime_ns,
+        "min_date": dates.min() if not dates.empty else None,
+        "max_date": dates.max() if not dates.empty else None,
+        "prior_max": prior_max,
+    }
+    # the index is rebuilt whenever it disagrees with the table, so it is not fsynced
+    append_records(_index_path(path), [entry], fsync=False)
+
+def _rebuild_csv_index(path: Path) -> None:
+    """Index an existing CSV table with one entry per run of rows sharing a date."""
+    entries: list[dict] = []
+    with open(path, "rb") as f:
+        stat = os.fstat(f.fileno())
+        offset = 0
+
+        def lines():
+            nonlocal offset
+            for line in f:
+                offset += len(line)
+                yield line.decode("utf-8")
+
+        reader = csv.reader(lines())
+        header = next(reader, [])
+        if "date" not in header:
+            return
+        date_col = header.index("date")
+        prior_max = None
+        start = offset
+        for row in reader:
+            day = _day_string(row[date_col] if date_col < len(row) else "")
+            if entries and entries[-1]["min_date"] == day:
+                entries[-1]["end"] = offset
+            else:
+                if entries and entries[-1]["max_date"] is not None and (prior_max is None or entries[-1]["max_date"] > prior_max):
+                    prior_max = entries[-1]["max_date"]
+                entries.append({"start": start, "end": offset, "mtime_ns": stat.st_mtime_ns,
+                                "min_date": day, "max_date": day, "prior_max": prior_max})
+            start = offset
+    write_records(_index_path(path), entries)
+
+def _index_ranges_since(path: Path, cutoff: str, size: int, mtime_ns: int, data_start: int) -> list[tuple[int, int]] | None:
+    """Byte ranges of the index entries that may hold rows dated `cutoff` or later, or None if the index is stale."""
+    index_path = _index_path(path)
+    want = 64
+    while True:
+        entries = read_records(index_path, last=want)
+        if not entries or entries[-1]["end"] != size or entries[-1]["mtime_ns"] != mtime_ns:
+            return None
+        ranges = []
+        expected_end = size
+        for entry in reversed(entries):
+            if entry["end"] > expected_end:
+                # rows rolled back after this entry was written
+                continue
+            if entry["end"] < expected_end:
+                return None
+            if entry["max_date"] is not None and entry["max_date"] >= cutoff:
+                ranges.append((entry["start"], entry["end"]))
+            expected_end = entry["start"]
+            if expected_end == data_start or entry["prior_max"] is None or entry["prior_max"] < cutoff:
+                return ranges[::-1]
+        if len(entries) < want:
+            return None
+        want *= 2
+
+def read_csv_since(path: Path | str, start_date: date | str) -> pd.DataFrame:
+    """
+    Rows of a CSV table that may have `date` on or after `start_date`
+    (callers filter the exact dates). Only the byte ranges the date offset
+    index points at are read, so the cost follows the size of the window,
+    not the table. A missing or stale index is rebuilt with one pass over the file.
+    """
+    path = Path(path)
+    if not path.exists():
+        return pd.DataFrame()
+    cutoff = str(pd.Timestamp(start_date).date())
+    with open(path, "rb") as f:
+        header = f.readline()
+        data_start = f.tell()
+        stat = os.fstat(f.fileno())
+        if stat.st_size == data_start:
+            return pd.read_csv(path)
+        try:
+            ranges = _index_ranges_since(path, cutoff, stat.st_size, stat.st_mtime_ns, data_start)
+        except (KeyError, TypeError, json.JSONDecodeError):
+            ranges = None
+        if ranges is None:
+            _rebuild_csv_index(path)
+            ranges = _index_ranges_since(path, cutoff, stat.st_size, stat.st_mtime_ns, data_start)
+        if ranges is None:
+            return pd.read_csv(path)
+        chunks = []
+        for start, end in ranges:
+            f.seek(start)
+            chunks.append(f.read(end - start))
+    return pd.read_csv(io.BytesIO(header + b"".join(chunks)))
+
+# ----------------------------------
+# Converting Existing Runs
+# ----------------------------------
+
+def convert_run(model_path: Path | str, storage_backend: str, remove_source: bool = False) -> None:
+    """
+    Convert the ledger tables of an existing run to another storage backend
+    and record the new backend in the run's `config.json`.
+
+    The source files are kept unless `remove_source` is True.
+    """
+    root = Path(model_path)
+    config_path = root / "config.json"
+    with open(config_path, "r") as f:
+        config = json.load(f)
+    current_backend = config.get("storage_backend", "csv")
+    if current_backend == storage_backend:
+        print(f"{root} already uses the {storage_backend} storage backend.")
+        return
+
+    portfolio_dir = root / "portfolio"
+    converted = set()
+    with transaction(portfolio_dir / table_file_name("portfolio", storage_backend)):
+        for table in TABLE_COLUMNS:
+            source = portfolio_dir / table_file_name(table, current_backend)
+            target = portfolio_dir / table_file_name(table, storage_backend)
+            df = read_table(source)
+            if df.columns.empty:
+                df = pd.DataFrame(columns=TABLE_COLUMNS[table])
+            write_table(df, target)
+            converted.add(source)
+            if source.suffix == ".csv" and _index_path(source).exists():
+                converted.add(_index_path(source))
+        for name in DOCUMENTS:
+            source = portfolio_dir / document_file_name(name, current_backend)
+            target = portfolio_dir / document_file_name(name, storage_backend)
+            data = read_document(source)
+            if source == target or data is None:
+                continue
+            write_document(target, data)
+            converted.add(source)
+
+    config["storage_backend"] = storage_backend
+    atomic_write(config_path, json.dumps(config))
+
+    if remove_source:
+        # sqlite addresses are removed with their database
+        for source in {address[0] if (address := _sqlite_address(path)) else path for path in converted}:
+            source.unlink(missing_ok=True)
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Convert a LIBB run directory to another storage backend.")
+    parser.add_argument("model_path")
+    parser.add_argument("storage_backend", choices=sorted(STORAGE_BACKENDS))
+    parser.add_argument("--remove-source", action="store_true", help="delete the old table files after converting")
+    args = parser.parse_args()
+    convert_run(args.model_path, args.storage_backend, remove_source=args.remove_source)
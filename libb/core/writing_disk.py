@@ -1,7 +1,9 @@
 from pathlib import Path
 import json
+import os
 from datetime import date
-from libb.other.types_file import Log, ModelSnapshot, DiskLayout
+from libb.other.types_file import IncrementalSnapshot, Log, ModelSnapshot, DiskLayout
+from libb.core.storage import append_records, atomic_write, write_document, write_table
 from dataclasses import asdict
 import pandas as pd
 
@@ -18,17 +20,17 @@ class DiskWriter:
 
     def save_deep_research(self, text: str) -> Path:
         path = self.layout.deep_research_dir / f"deep_research - {self.run_date}.txt"
-        path.write_text(text, encoding="utf-8")
+        atomic_write(path, text)
         return path
 
     def save_daily_update(self, text: str) -> Path:
         path = self.layout.daily_reports_dir / f"daily_update - {self.run_date}.txt"
-        path.write_text(text, encoding="utf-8")
+        atomic_write(path, text)
         return path
     
     def save_prompt(self, text: str) -> Path:
         path = self.layout.prompt_dir / f"prompt - {self.run_date}.txt"
-        path.write_text(text, encoding="utf-8")
+        atomic_write(path, text)
         return path
 
     def save_additional_log(
@@ -40,8 +42,10 @@ class DiskWriter:
     ) -> None:
         path = self.layout.research_dir / folder / file_name
         path.parent.mkdir(parents=True, exist_ok=True)
-        mode = "a" if append else "w"
-        with open(path, mode, encoding="utf-8") as f:
+        if not append:
+            atomic_write(path, text)
+            return
+        with open(path, "a", encoding="utf-8") as f:
             f.write(text)
 
     # ----------------------------
@@ -49,33 +53,27 @@ class DiskWriter:
     # ----------------------------
 
     def save_orders(self, orders: dict) -> None:
-        with open(self.layout.pending_trades_path, "w") as f:
-            json.dump(orders, f, indent=2)
+        write_document(self.layout.pending_trades_path, orders)
 
     # ----------------------------
     # Config
     # ----------------------------
 
     def overwrite_config(self, config_dict: dict) -> None:
-        with open(self.layout.config_path, "w") as f:
-            json.dump(config_dict, f)
+        atomic_write(self.layout.config_path, json.dumps(config_dict))
 
     # ----------------------------
     # Metrics
     # ----------------------------
 
-    def save_performance(self, performance_dict: list[dict]) -> None:
-        with open(self.layout.performance_path, "w") as f:
-            json.dump(performance_dict, f, indent=2)
+    def append_performance(self, performance_log: dict) -> None:
+        append_records(self.layout.performance_path, [performance_log])
 
-    def save_behavior(self, behavior_dict: list[dict]) -> None:
-        with open(self.layout.behavior_path, "w") as f:
-            json.dump(behavior_dict, f, indent=2)
+    def append_behavior(self, behavior_log: dict) -> None:
+        append_records(self.layout.behavior_path, [behavior_log])
 
-
-    def save_sentiment(self, sentiment_dict: list[dict]) -> None:
-        with open(self.layout.sentiment_path, "w") as f:
-            json.dump(sentiment_dict, f, indent=2)            
+    def append_sentiment(self, sentiment_log: dict) -> None:
+        append_records(self.layout.sentiment_path, [sentiment_log])
 
     # ----------------------------
     # Logging
@@ -84,11 +82,10 @@ class DiskWriter:
     def _save_logging_file_to_disk(self, log: Log):
         log_file_name = Path(f"{self.run_date}.json")
         full_path = self.layout.logging_dir / log_file_name
-        with open(full_path, "w") as file:
-            try:
-                json.dump(asdict(log), file, indent=2)
-            except Exception as e:
-                    raise RuntimeError(f"Error while saving JSON log to {full_path}.") from e
+        try:
+            atomic_write(full_path, json.dumps(asdict(log), indent=2))
+        except Exception as e:
+                raise RuntimeError(f"Error while saving JSON log to {full_path}.") from e
         return
     
     # ----------------------------
@@ -96,33 +93,47 @@ class DiskWriter:
     # ----------------------------
     
     def _save_cash(self, cash: float) -> None:
-        with open(self.layout.cash_path, "w") as f:
-                json.dump({"cash": cash}, f, indent=2)
+        write_document(self.layout.cash_path, {"cash": cash})
 
 
     def _override_json_file(self, data: list[dict] | dict[str, list[dict]], path: Path) -> None:
-        with open(path, "w") as file:
-            json.dump(data, file, indent=2)
+        atomic_write(path, json.dumps(data, indent=2))
         return
     
     def _override_csv_file(self, df: pd.DataFrame, path: Path) -> None:
-        df.to_csv(path, mode="w", header=True, index=False)
+        write_table(df, path)
         return
 
     # ----------------------------
     # Snapshot
     # ----------------------------
 
-    def _load_snapshot_to_disk(self, snapshot: ModelSnapshot) -> None:
+    def _load_snapshot_to_disk(self, snapshot: ModelSnapshot | IncrementalSnapshot) -> None:
         """Override CSV and JSON disk artifacts based on prior disk snapshot."""
-        
+        if isinstance(snapshot, IncrementalSnapshot):
+            self._load_incremental_snapshot_to_disk(snapshot)
+            return
+
         self._override_csv_file(snapshot.portfolio, self.layout.portfolio_path)
         self._override_csv_file(snapshot.portfolio_history, self.layout.portfolio_history_path)
         self._override_csv_file(snapshot.trade_log, self.layout.trade_log_path)
         self._override_csv_file(snapshot.position_history, self.layout.position_history_path)
 
-        self._override_json_file(snapshot.performance, self.layout.performance_path)
-        self._override_json_file(snapshot.sentiment, self.layout.sentiment_path)
-        self._override_json_file(snapshot.pending_trades, self.layout.pending_trades_path)
-        self._override_json_file(snapshot.behavior, self.layout.behavior_path)
-        return
\ No newline at end of file
+        write_document(self.layout.pending_trades_path, snapshot.pending_trades)
+        self._save_cash(snapshot.cash)
+        return
+
+    def _load_incremental_snapshot_to_disk(self, snapshot: IncrementalSnapshot) -> None:
+        """Truncate append-only tables to their recorded length and restore the copied files."""
+        for path, length in snapshot.file_lengths.items():
+            size = path.stat().st_size if path.exists() else -1
+            if size < length:
+                raise RuntimeError(f"Cannot roll back {path}: it is shorter than at startup ({size} < {length} bytes).")
+            if size > length:
+                os.truncate(path, length)
+
+        for path, content in snapshot.file_contents.items():
+            if content is None:
+                path.unlink(missing_ok=True)
+            else:
+                atomic_write(path, content)
@@ -0,0 +1,179 @@
+from datetime import date
+from pathlib import Path
+from threading import Lock
+from typing import Callable, Protocol, runtime_checkable
+
+import pandas as pd
+
+from libb.other.types_file import MarketConfig, MarketHistoryObject, NoMarketDataError
+from libb.execution.market_cache import OHLCV_COLUMNS, frame_to_history
+
+@runtime_checkable
+class DataSource(Protocol):
+    """
+    A provider of daily OHLCV bars.
+
+    `name` identifies the source in logs and in the source health registry.
+    `is_enabled()` decides, per call, whether the source should be tried
+    (e.g. only when an API key is configured). `fetch()` returns the bars for
+    [start_date, end_date] inclusive and raises if it has none.
+    """
+
+    name: str
+
+    def is_enabled(self, config: MarketConfig) -> bool: ...
+
+    def fetch(self, ticker: str, start_date: date | str, end_date: date | str,
+              config: MarketConfig) -> MarketHistoryObject: ...
+
+# ----------------------------------
+# Built-in Sources
+# ----------------------------------
+
+class _BuiltinSource:
+    """Adapter for the download functions in `libb.execution.get_market_data`."""
+
+    def __init__(self, name: str, function_name: str, passes_config: bool = False,
+                 requires: Callable[[MarketConfig], bool] | None = None):
+        self.name = name
+        self._function_name = function_name
+        self._passes_config = passes_config
+        self._requires = requires
+
+    def is_enabled(self, config: MarketConfig) -> bool:
+        if config.offline:
+            return False
+        return self._requires is None or self._requires(config)
+
+    def fetch(self, ticker: str, start_date: date | str, end_date: date | str,
+              config: MarketConfig) -> MarketHistoryObject:
+        # looked up at call time: get_market_data imports this module
+        from libb.execution import get_market_data
+        download = getattr(get_market_data, self._function_name)
+        if self._passes_config:
+            data = download(ticker, start_date, end_date, config)
+        else:
+            data = download(ticker, start_date, end_date)
+        if data is None:
+            raise NoMarketDataError(f"{self.name} returned no data for {ticker}")
+        return data
+
+class LocalDirectorySource:
+    """
+    Serves bars from a directory of per-ticker files, without network access.
+
+    Each ticker is read from `<root>/<TICKER>.parquet` or `<root>/<TICKER>.csv`
+    with a `Date` column (or index) and Open/High/Low/Close/Volume columns
+    (column names are case-insensitive). Parsed files are kept in memory until
+    their modification time changes.
+
+    With no `root`, the directory is taken from `MarketConfig.local_data_dir`
+    (`LIBB_LOCAL_DATA_DIR`) and the source is disabled while that is unset.
+    """
+
+    def __init__(self, root: Path | str | None = None, name: str = "local"):
+        self.name = name
+        self.root = Path(root) if root is not None else None
+        self._frames: dict[Path, tuple[int, pd.DataFrame]] = {}
+        self._lock = Lock()
+
+    def _resolve_root(self, config: MarketConfig) -> Path | None:
+        return self.root if self.root is not None else config.local_data_dir
+
+    def is_enabled(self, config: MarketConfig) -> bool:
+        root = self._resolve_root(config)
+        return root is not None and root.is_dir()
+
+    def _find_file(self, root: Path, ticker: str) -> Path:
+        stem = ticker.upper().replace("/", "_").replace("\\", "_")
+        for suffix in (".parquet", ".csv"):
+            path = root / f"{stem}{suffix}"
+            if path.exists():
+                return path
+        raise NoMarketDataError(f"No local market data file for {ticker} in {root}")
+
+    @staticmethod
+    def _read(path: Path) -> pd.DataFrame:
+        if path.suffix == ".parquet":
+            df = pd.read_parquet(path)
+        else:
+            df = pd.read_csv(path)
+        df = df.rename(columns={col: str(col).strip().title() for col in df.columns})
+        if "Date" in df.columns:
+            df = df.set_index("Date")
+        df.index = pd.DatetimeIndex(pd.to_datetime(df.index)).normalize()
+        df.index.name = "Date"
+        missing = [col for col in OHLCV_COLUMNS if col not in df.columns]
+        if missing:
+            raise ValueError(f"{path} is missing columns: {missing}")
+        return df[OHLCV_COLUMNS].sort_index()
+
+    def _load(self, path: Path) -> pd.DataFrame:
+        mtime = path.stat().st_mtime_ns
+        with self._lock:
+            cached = self._frames.get(path)
+            if cached is not None and cached[0] == mtime:
+                return cached[1]
+        df = self._read(path)
+        with self._lock:
+            self._frames[path] = (mtime, df)
+        return df
+
+    def fetch(self, ticker: str, start_date: date | str, end_date: date | str,
+              config: MarketConfig) -> MarketHistoryObject:
+        root = self._resolve_root(config)
+        if root is None:
+            raise RuntimeError("No local market data directory configured (set LIBB_LOCAL_DATA_DIR).")
+        df = self._load(self._find_file(root, ticker))
+        in_range = df.loc[(df.index >= pd.Timestamp(start_date)) & (df.index <= pd.Timestamp(end_date))]
+        if in_range.empty:
+            raise NoMarketDataError(f"No local market data for {ticker} between {start_date} and {end_date}.")
+        return frame_to_history(in_range, ticker, start_date, end_date)
+
+# ----------------------------------
+# Registry
+# ----------------------------------
+
+_data_sources: list[DataSource] = [
+    LocalDirectorySource(),
+    _BuiltinSource("yf", "download_yf_data"),
+    _BuiltinSource("stooq", "download_stooq_data"),
+    _BuiltinSource("finnhub", "download_finnhub_data", passes_config=True,
+                   requires=lambda config: config.finnhub_key is not None),
+    _BuiltinSource("alpha_vantage", "download_alpha_vantage_data", passes_config=True,
+                   requires=lambda config: config.alpha_vantage_key is not None),
+]
+_registry_lock = Lock()
+
+def register_data_source(source: DataSource, position: int | None = None) -> None:
+    """
+    Add a data source to the registry, replacing any source with the same name.
+
+    Sources are tried in registry order (adjusted by measured health), so
+    `position=0` makes a source the first choice. By default it is appended.
+    """
+    if not isinstance(source, DataSource):
+        raise TypeError(f"{source!r} does not implement the DataSource protocol.")
+    with _registry_lock:
+        _data_sources[:] = [existing for existing in _data_sources if existing.name != source.name]
+        if position is None:
+            _data_sources.append(source)
+        else:
+            _data_sources.insert(position, source)
+
+def unregister_data_source(name: str) -> None:
+    """Remove a data source by name. Unknown names are ignored."""
+    with _registry_lock:
+        _data_sources[:] = [source for source in _data_sources if source.name != name]
+
+def get_data_source(name: str) -> DataSource:
+    with _registry_lock:
+        for source in _data_sources:
+            if source.name == name:
+                return source
+    raise ValueError(f"Unknown data source: {name}")
+
+def registered_data_sources() -> list[DataSource]:
+    """Return the registered sources in priority order."""
+    with _registry_lock:
+        return list(_data_sources)
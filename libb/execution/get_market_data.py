@@ -1,24 +1,32 @@
-import yfinance as yf
-from libb.other.types_file import MarketConfig, MarketDataObject, MarketHistoryObject
+from libb.other.types_file import (CompactMarketHistory, MarketConfig, MarketDataObject, MarketHistoryObject,
+                                   NoMarketDataError)
+from libb.execution.http_client import get_http_client
+from libb.execution.source_health import get_source_health
+from libb.execution.trading_calendar import get_trading_calendar
+from libb.execution.data_sources import get_data_source, registered_data_sources
+from libb.execution.market_cache import (OHLCV_COLUMNS, OHLCVCache, frame_to_history, get_market_cache,
+                                         get_snapshot_cache, history_to_frame)
 from datetime import date
 import pandas as pd
 import io
-import requests
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from threading import Lock
 from typing import cast, Tuple
 
 #TODO: Set properly set up config
-#TODO: Fix functions for Finnhub and Alpha Vantage, then call get_valid_data_sources()
 
 def get_valid_data_sources() -> Tuple[list[str], MarketConfig]:
+    """
+    Return the names of the enabled data sources (see
+    `libb.execution.data_sources`), ordered by measured health (see
+    `libb.execution.source_health`), together with the market config.
+    Sources whose circuit breaker is open are left out.
+    """
     config = MarketConfig.from_env()
 
-    valid_data_sources = ["yf", "stooq"]
-
-    if config.finnhub_key is not None:
-        valid_data_sources.append("finnhub")
-    if config.alpha_vantage_key is not None:
-        valid_data_sources.append("alpha_vantage")
-    return valid_data_sources, config
+    valid_data_sources = [source.name for source in registered_data_sources() if source.is_enabled(config)]
+    return get_source_health().order(valid_data_sources), config
 
 def download_data_on_given_date(ticker: str, date: date | str) -> MarketDataObject:
     """
@@ -28,6 +36,10 @@ def download_data_on_given_date(ticker: str, date: date | str) -> MarketDataObje
     and extracting the first row. Falls back across configured data sources
     automatically.
 
+    While a run-scoped `MarketSnapshotCache` is active (see
+    `Processing.processing()`), repeated requests for the same
+    (ticker, date) are answered from memory.
+
     Args:
         ticker (str): Stock ticker symbol (e.g. "AAPL", "MSFT").
         date (str or date): The trading date to fetch. Must be a market day —
@@ -42,8 +54,30 @@ def download_data_on_given_date(ticker: str, date: date | str) -> MarketDataObje
             snapshot.
         RuntimeError: If all configured data sources fail.
     """
+    snapshot_cache = get_snapshot_cache()
+    if snapshot_cache is not None:
+        cached_snapshot = snapshot_cache.get(ticker, date)
+        if cached_snapshot is not None:
+            return cached_snapshot
+    return _download_snapshot(ticker, date)
+
+def _download_snapshot(ticker: str, date: date | str) -> MarketDataObject:
+    """Download a single-day snapshot and add it to the active snapshot cache, without looking it up first."""
     start_date = pd.Timestamp(date)
     data = download_data_on_given_range(ticker, start_date, start_date)
+    snapshot = history_to_snapshot(ticker, data)
+
+    snapshot_cache = get_snapshot_cache()
+    if snapshot_cache is not None:
+        snapshot_cache.put(ticker, date, snapshot)
+    return snapshot
+
+def history_to_snapshot(ticker: str, data: MarketHistoryObject) -> MarketDataObject:
+    """Convert the first bar of a MarketHistoryObject into a MarketDataObject."""
+    if isinstance(data, CompactMarketHistory) and len(data.index):
+        snapshot = data.first_bar()
+        snapshot["Ticker"] = ticker
+        return snapshot
     try:
         snapshot: MarketDataObject = {
             "Ticker": ticker,
@@ -55,15 +89,67 @@ def download_data_on_given_date(ticker: str, date: date | str) -> MarketDataObje
                                     }
     except Exception as e:
         raise TypeError(f"Could not convert MarketHistoryObject to MarketDataObject: ({e})")
-    
     return snapshot
 
+def download_price_panel(tickers: list[str], date: date | str) -> pd.DataFrame:
+    """
+    Single-day bars for several tickers as one frame.
+
+    Tickers already in the active `MarketSnapshotCache` are served from it.
+    The rest are requested together through `download_data_for_tickers()`
+    and added to the cache. Tickers the batch could not provide are fetched
+    one by one, which raises if every source fails. Each ticker is looked up
+    in the cache once, so it counts as one hit or one miss.
+
+    Returns:
+        pd.DataFrame: Open/High/Low/Close/Volume columns with one row per
+            entry of `tickers`, in the same order.
+    """
+    snapshot_cache = get_snapshot_cache()
+    snapshots: dict[str, MarketDataObject] = {}
+    for ticker in dict.fromkeys(tickers):
+        cached_snapshot = snapshot_cache.get(ticker, date) if snapshot_cache is not None else None
+        if cached_snapshot is not None:
+            snapshots[ticker] = cached_snapshot
+
+    missing = [ticker for ticker in dict.fromkeys(tickers) if ticker not in snapshots]
+    if missing:
+        histories = download_data_for_tickers(missing, date, date)
+        for ticker in missing:
+            data = histories.get(ticker.upper())
+            try:
+                snapshot = history_to_snapshot(ticker, data) if data is not None else None
+            except TypeError as e:
+                print(f"Skipping batched data for {ticker}: {e}")
+                snapshot = None
+            if snapshot is None:
+                # the lookup above already counted this ticker's cache miss
+                snapshots[ticker] = _download_snapshot(ticker, date)
+                continue
+            if snapshot_cache is not None:
+                snapshot_cache.put(ticker, date, snapshot)
+            snapshots[ticker] = snapshot
+
+    columns = ["Open", "High", "Low", "Close", "Volume"]
+    panel = pd.DataFrame.from_dict(snapshots, orient="index", columns=columns)
+    return panel.reindex(list(tickers))
+
 def download_data_on_given_range(ticker: str, start_date: date | str, end_date: date | str) -> MarketHistoryObject:
     """
     Download daily OHLCV data for a ticker over a date range.
 
-    Attempts each configured data source in order (yfinance, then Stooq)
-    and returns the first successful result. Raises if all sources fail.
+    Attempts each registered data source in order (see
+    `libb.execution.data_sources`; by default a local directory when
+    `LIBB_LOCAL_DATA_DIR` is set, then yfinance, Stooq, Finnhub and Alpha
+    Vantage) and returns the first successful result. Raises if all sources fail.
+    When `MarketConfig.hedge_delay` is set, later sources are started
+    concurrently after that delay instead of waiting for earlier ones to fail.
+
+    Bars are served from the on-disk OHLCV cache (see `MarketConfig.cache_dir`)
+    when available; only date ranges the cache does not cover are downloaded.
+
+    When `MarketConfig.compact_history` is set the result is a
+    `CompactMarketHistory`, which supports the same key access.
 
     Args:
         ticker (str): Stock ticker symbol (e.g. "AAPL", "MSFT").
@@ -78,31 +164,177 @@ def download_data_on_given_range(ticker: str, start_date: date | str, end_date:
     Raises:
         RuntimeError: If all configured data sources fail to return valid data.
     """
-    valid_data_sources = ["yf", "stooq"]
+    cache = get_market_cache()
+    if cache is None:
+        data = _download_from_sources(ticker, start_date, end_date)
+    else:
+        data = cache.get_range(ticker, start_date, end_date, _download_from_sources)
+    return compact_history(data, MarketConfig.from_env().compact_history)
+
+def compact_history(data: MarketHistoryObject, dtype: str | None) -> MarketHistoryObject:
+    """Convert to a `CompactMarketHistory` with the given price dtype. None returns `data` unchanged."""
+    if dtype is None or (isinstance(data, CompactMarketHistory) and data.ohlc.dtype == dtype):
+        return data
+    compact = CompactMarketHistory.from_frame(history_to_frame(data), data["Ticker"],
+                                              data["start_date"], data["end_date"], dtype=dtype)
+    return cast(MarketHistoryObject, compact)
+
+def download_data_for_tickers(tickers: list[str], start_date: date | str, end_date: date | str) -> dict[str, MarketHistoryObject]:
+    """
+    Download daily OHLCV data for several tickers over the same date range.
+
+    Tickers fully covered by the on-disk OHLCV cache are served locally.
+    When yfinance is the preferred source, all remaining tickers are
+    requested from it in a single batched call; symbols it fails to return
+    fall back to the other sources one by one.
+
+    Args:
+        tickers (list[str]): Stock ticker symbols. Duplicates are ignored.
+        start_date (str or date): Start of the date range (inclusive).
+        end_date (str or date): End of the date range (inclusive).
+
+    Returns:
+        dict[str, MarketHistoryObject]: Market data keyed by upper-case
+            ticker. Tickers no source could provide are omitted.
+    """
+    unique_tickers = list(dict.fromkeys(ticker.upper() for ticker in tickers))
+    cache = get_market_cache()
+    valid_data_sources, config = get_valid_data_sources()
+    fallback_sources = [source for source in valid_data_sources if source != "yf"]
+
+    if cache is None:
+        to_download = unique_tickers
+    else:
+        to_download = [ticker for ticker in unique_tickers if not cache.is_covered(ticker, start_date, end_date)]
+    batch = {}
+    # tickers yf has already been asked for; only these skip yf in the fallback
+    batch_attempted: set[str] = set()
+    if to_download and valid_data_sources[:1] == ["yf"]:
+        batch = download_yf_batch_data(to_download, start_date, end_date)
+        batch_attempted = set(to_download)
+
+    def fetch(ticker: str, gap_start: date | str, gap_end: date | str) -> MarketHistoryObject:
+        data = batch.get(ticker)
+        if data is not None:
+            frame = history_to_frame(data)
+            frame = frame.loc[(frame.index >= pd.Timestamp(gap_start)) & (frame.index <= pd.Timestamp(gap_end))]
+            if frame.empty:
+                raise NoMarketDataError(f"No market data available for {ticker} between {gap_start} and {gap_end}.")
+            return frame_to_history(frame, ticker, gap_start, gap_end)
+        sources = fallback_sources if ticker in batch_attempted else None
+        return _download_from_sources(ticker, gap_start, gap_end, sources=sources)
+
+    results: dict[str, MarketHistoryObject] = {}
+    for ticker in unique_tickers:
+        try:
+            if cache is None:
+                data = fetch(ticker, start_date, end_date)
+            else:
+                data = cache.get_range(ticker, start_date, end_date, fetch)
+            results[ticker] = compact_history(data, config.compact_history)
+        except Exception as e:
+            print(f"Failed batch download for {ticker}: {e}")
+    return results
+
+def _download_from_sources(ticker: str, start_date: date | str, end_date: date | str,
+                           sources: list[str] | None = None) -> MarketHistoryObject:
+    """Download a range directly from the data sources, bypassing the cache."""
+    valid_data_sources, config = get_valid_data_sources()
+    if sources is not None:
+        valid_data_sources = [source for source in valid_data_sources if source in sources]
+    if config.hedge_delay is not None and len(valid_data_sources) > 1:
+        return _download_hedged(ticker, start_date, end_date, valid_data_sources, config)
+
     for source in valid_data_sources:
-        match source:
-
-            case "yf":
-                try:
-                    data = download_yf_data(ticker, start_date, end_date)
-                    if data is not None:
-                            return cast(MarketHistoryObject, data)
-                except Exception as e:
-                    print(f"Failed download from yf: {e}")
-
-            case "stooq":
-                try:
-                    data = download_stooq_data(ticker, start_date, end_date)
-                    if data is not None:
-                        return cast(MarketHistoryObject, data)
-                except Exception as e:
-                    print(f"Failed download from stooq: {e}")
+        try:
+            return _download_from_source(source, ticker, start_date, end_date, config)
+        except Exception as e:
+            print(f"Failed download from {source}: {e}")
 
     raise RuntimeError(f"""All valid data sources ({valid_data_sources}) failed to return valid data. 
                        Try setting more valid API keys in your environment or checking your internet.""")
 
+# shared by every hedged download; threads are started on demand up to this many
+HEDGE_MAX_WORKERS = 16
+_hedge_executor: ThreadPoolExecutor | None = None
+_hedge_executor_lock = Lock()
+# yf.download keeps shared module state and is not thread-safe; hedged races
+# and concurrent callers take turns through this lock
+_yf_lock = Lock()
+
+def _get_hedge_executor() -> ThreadPoolExecutor:
+    """Return the process-wide executor for hedged downloads, created on first use."""
+    global _hedge_executor
+    with _hedge_executor_lock:
+        if _hedge_executor is None:
+            _hedge_executor = ThreadPoolExecutor(max_workers=HEDGE_MAX_WORKERS, thread_name_prefix="libb-hedge")
+        return _hedge_executor
+
+def _download_hedged(ticker: str, start_date: date | str, end_date: date | str,
+                     sources: list[str], config: MarketConfig) -> MarketHistoryObject:
+    """
+    Race the data sources in order. Each source gets a head start of
+    `hedge_delay` seconds; if it has not answered by then (or fails sooner)
+    the next source is started as well. The first valid answer wins.
+
+    Losing requests are not interrupted and finish in the background.
+    """
+    hedge_delay = config.hedge_delay
+    executor = _get_hedge_executor()
+    running: dict[Future, str] = {}
+    try:
+        for index, source in enumerate(sources):
+            running[executor.submit(_download_from_source, source, ticker, start_date, end_date, config)] = source
+            is_last = index == len(sources) - 1
+
+            while running:
+                done, _ = wait(running, timeout=None if is_last else hedge_delay, return_when=FIRST_COMPLETED)
+                if not done:
+                    # hedge delay elapsed: start the next source alongside the slow one
+                    break
+                for future in done:
+                    finished_source = running.pop(future)
+                    try:
+                        return future.result()
+                    except Exception as e:
+                        print(f"Failed download from {finished_source}: {e}")
+                if not is_last:
+                    # a failure frees the slot: start the next source immediately
+                    break
+    finally:
+        # requests still queued behind other callers' downloads are no longer needed
+        for future in running:
+            future.cancel()
+
+    raise RuntimeError(f"""All valid data sources ({sources}) failed to return valid data. 
+                       Try setting more valid API keys in your environment or checking your internet.""")
+
+def _download_from_source(source: str, ticker: str, start_date: date | str, end_date: date | str,
+                          config: MarketConfig) -> MarketHistoryObject:
+    """Download from a single named source, recording the outcome in the source health registry."""
+    started = time.perf_counter()
+    try:
+        data = get_data_source(source).fetch(ticker, start_date, end_date, config)
+    except Exception as e:
+        get_source_health().record(source, time.perf_counter() - started, succeeded=False, error=e)
+        raise
+    get_source_health().record(source, time.perf_counter() - started, succeeded=True)
+    return data
+
+def get_source_latencies() -> dict[str, list[tuple[float, bool]]]:
+    """Return the most recent (seconds, succeeded) samples recorded for each data source."""
+    return get_source_health().latencies()
+
+
+def _has_sessions(start_date: date | str, end_date: date | str) -> bool:
+    """Whether [start_date, end_date] contains an NYSE session; assumed True if the calendar is unavailable."""
+    try:
+        return get_trading_calendar().session_count(start_date, end_date) > 0
+    except Exception:
+        return True
 
 def download_yf_data(ticker: str, start_date: date | str, end_date: date | str) -> MarketHistoryObject:
+    import yfinance as yf
 
     # account for YF ticker differences
     ticker = ticker.replace(".", "-")
@@ -111,20 +343,24 @@ def download_yf_data(ticker: str, start_date: date | str, end_date: date | str)
     end_date = pd.Timestamp(end_date) + pd.Timedelta(days=1)
 
     try:
-        ticker_data = yf.download(
-        ticker,
-        start=start_date,
-        end=end_date,
-        auto_adjust=True,
-        progress=False,
-    )
+        with _yf_lock:
+            ticker_data = yf.download(
+            ticker,
+            start=start_date,
+            end=end_date,
+            auto_adjust=True,
+            progress=False,
+        )
     except Exception as e:
         raise RuntimeError(
             f"Failed to download market data for {ticker}"
         ) from e
 
     if ticker_data is None or ticker_data.empty:
-        raise ValueError(
+        # yfinance reports network, DNS and rate-limit failures as an empty frame
+        if _has_sessions(start_date, pd.Timestamp(end_date) - pd.Timedelta(days=1)):
+            raise RuntimeError(f"yfinance returned no bars for {ticker} over a range with trading sessions.")
+        raise NoMarketDataError(
             f"No market data available for {ticker}. "
             "Market may have been closed (weekend or holiday)."
     )
@@ -143,6 +379,64 @@ def download_yf_data(ticker: str, start_date: date | str, end_date: date | str)
         }
     return data
 
+def download_yf_batch_data(tickers: list[str], start_date: date | str, end_date: date | str) -> dict[str, MarketHistoryObject]:
+    """
+    Download several tickers from yfinance in one request.
+    Returns only the tickers yfinance had data for; never raises.
+    """
+    import yfinance as yf
+
+    # account for YF ticker differences
+    yf_symbols = {ticker.replace(".", "-"): ticker for ticker in tickers}
+
+    # yf date range is exclusive
+    exclusive_end = pd.Timestamp(end_date) + pd.Timedelta(days=1)
+
+    started = time.perf_counter()
+    try:
+        with _yf_lock:
+            batch_data = yf.download(
+            list(yf_symbols),
+            start=start_date,
+            end=exclusive_end,
+            auto_adjust=True,
+            progress=False,
+            group_by="ticker",
+        )
+    except Exception as e:
+        get_source_health().record("yf", time.perf_counter() - started, succeeded=False, error=e)
+        print(f"Failed batch download from yf: {e}")
+        return {}
+
+    if batch_data is None or batch_data.empty:
+        # as in download_yf_data(), an empty frame over trading sessions is a failed request
+        if _has_sessions(start_date, end_date):
+            error = RuntimeError("yfinance returned no bars for a range with trading sessions.")
+            get_source_health().record("yf", time.perf_counter() - started, succeeded=False, error=error)
+        else:
+            get_source_health().record("yf", time.perf_counter() - started, succeeded=True)
+        return {}
+    get_source_health().record("yf", time.perf_counter() - started, succeeded=True)
+
+    results: dict[str, MarketHistoryObject] = {}
+    for yf_symbol, ticker in yf_symbols.items():
+        if isinstance(batch_data.columns, pd.MultiIndex):
+            if yf_symbol not in batch_data.columns.get_level_values(0):
+                continue
+            ticker_data = batch_data[yf_symbol]
+        elif len(yf_symbols) == 1:
+            ticker_data = batch_data
+        else:
+            continue
+
+        # failed symbols come back as all-NaN rows
+        ticker_data = ticker_data[OHLCV_COLUMNS].dropna(subset=["Close"])
+        if ticker_data.empty:
+            continue
+        ticker_data = ticker_data.round({"Open": 2, "High": 2, "Low": 2, "Close": 2})
+        results[ticker] = frame_to_history(ticker_data, ticker, start_date, end_date)
+    return results
+
 def download_finnhub_data(ticker: str, start_date: date | str, end_date: date | str, config: MarketConfig) -> MarketHistoryObject:
     # Convert dates to Unix timestamps (seconds)
     to_unix = lambda d: int(pd.Timestamp(d).timestamp())
@@ -156,7 +450,7 @@ def download_finnhub_data(ticker: str, start_date: date | str, end_date: date |
     }
 
     try:
-        response = requests.get("https://finnhub.io/api/v1/stock/candle", params=params)
+        response = get_http_client().get("https://finnhub.io/api/v1/stock/candle", params=params)
         response.raise_for_status()
         res_data = response.json()
     except Exception as e:
@@ -164,7 +458,9 @@ def download_finnhub_data(ticker: str, start_date: date | str, end_date: date |
 
     # Finnhub returns 's': 'ok' if successful
     if res_data.get("s") != "ok":
-        raise ValueError(f"No Finnhub data for {ticker}. API message: {res_data.get('s')}")
+        if res_data.get("s") == "no_data":
+            raise NoMarketDataError(f"No Finnhub data for {ticker}.")
+        raise RuntimeError(f"Finnhub request failed for {ticker}. API message: {res_data.get('s')}")
 
     # Convert lists to Series with a DatetimeIndex
     dates = pd.to_datetime(res_data["t"], unit="s")
@@ -182,6 +478,63 @@ def download_finnhub_data(ticker: str, start_date: date | str, end_date: date |
     return data
 
 def download_alpha_vantage_data(ticker: str, start_date: date | str, end_date: date | str, config: MarketConfig) -> MarketHistoryObject | None:
+    """
+    Download daily data from Alpha Vantage.
+
+    Alpha Vantage only serves the complete history (`outputsize=full`), so
+    the parsed history is cached per ticker in memory and on disk and each
+    range request is served by slicing it. See `_alpha_vantage_history()`
+    for the refresh policy.
+    """
+    history = _alpha_vantage_history(ticker, pd.Timestamp(end_date).normalize(), config)
+
+    # Slice the range
+    mask = (history.index >= pd.Timestamp(start_date)) & (history.index <= pd.Timestamp(end_date))
+    ticker_data = history.loc[mask]
+
+    if ticker_data.empty:
+        raise NoMarketDataError(f"Alpha Vantage range empty for {ticker}")
+
+    return frame_to_history(ticker_data, ticker, start_date, end_date)
+
+# ticker -> (full history, last date the history is known to be complete for)
+_alpha_vantage_histories: dict[str, tuple[pd.DataFrame, pd.Timestamp]] = {}
+
+def _alpha_vantage_history(ticker: str, end_date: pd.Timestamp, config: MarketConfig) -> pd.DataFrame:
+    """
+    Return the full daily history for a ticker, from memory, disk or the API.
+
+    A cached history is complete up to the day before it was downloaded.
+    It is only re-downloaded when a request ends after that day and the
+    cached copy was not already downloaded today.
+    """
+    key = ticker.upper()
+    last_final_day = pd.Timestamp.now().normalize() - pd.Timedelta(days=1)
+    disk_cache = OHLCVCache(config.cache_dir / "alpha_vantage") if config.cache_dir is not None else None
+
+    cached = _alpha_vantage_histories.get(key)
+    if cached is None and disk_cache is not None:
+        frame, coverage = disk_cache.load(key)
+        if coverage:
+            cached = (frame, coverage[-1][1])
+
+    if cached is not None:
+        frame, complete_through = cached
+        if end_date <= complete_through or complete_through >= last_final_day:
+            _alpha_vantage_histories[key] = cached
+            return frame
+
+    frame = _download_alpha_vantage_history(key, config)
+    _alpha_vantage_histories[key] = (frame, last_final_day)
+    if disk_cache is not None:
+        try:
+            # the full history has nothing before its first bar
+            disk_cache.store(key, frame, [(pd.Timestamp("1900-01-01"), last_final_day)])
+        except Exception as e:
+            print(f"Failed to cache Alpha Vantage history for {ticker}: {e}")
+    return frame
+
+def _download_alpha_vantage_history(ticker: str, config: MarketConfig) -> pd.DataFrame:
     params = {
         "function": "TIME_SERIES_DAILY",
         "symbol": ticker.upper(),
@@ -190,7 +543,7 @@ def download_alpha_vantage_data(ticker: str, start_date: date | str, end_date: d
     }
 
     try:
-        response = requests.get("https://www.alphavantage.co/query", params=params)
+        response = get_http_client().get("https://www.alphavantage.co/query", params=params)
         res_data = response.json()
         
         # Alpha Vantage returns errors in a 'Note' or 'Error Message' field
@@ -205,26 +558,17 @@ def download_alpha_vantage_data(ticker: str, start_date: date | str, end_date: d
     # Convert to DataFrame to handle slicing by date easily
     df = pd.DataFrame.from_dict(raw_series, orient="index").astype(float)
     df.index = pd.to_datetime(df.index)
+    df.index.name = "Date"
     df = df.sort_index()
 
-    # Slice the range
-    mask = (df.index >= pd.Timestamp(start_date)) & (df.index <= pd.Timestamp(end_date))
-    ticker_data = df.loc[mask]
-
-    if ticker_data.empty:
-        raise ValueError(f"Alpha Vantage range empty for {ticker}")
-
-    data: MarketHistoryObject = {
-        "Low": ticker_data["3. low"].round(2),
-        "High": ticker_data["2. high"].round(2),
-        "Close": ticker_data["4. close"].round(2),
-        "Open": ticker_data["1. open"].round(2),
-        "Volume": ticker_data["5. volume"].astype(int),
-        "Ticker": ticker,
-        "start_date": str(start_date),
-        "end_date": str(end_date)
-    }
-    return data
+    history = pd.DataFrame({
+        "Open": df["1. open"].round(2),
+        "High": df["2. high"].round(2),
+        "Low": df["3. low"].round(2),
+        "Close": df["4. close"].round(2),
+        "Volume": df["5. volume"].astype(int),
+    })
+    return history
 
 def download_stooq_data(
     ticker: str,
@@ -262,13 +606,13 @@ def download_stooq_data(
     }
 
     try:
-        response = requests.get(url, params=params)
+        response = get_http_client().get(url, params=params)
         response.raise_for_status()
     except Exception as e:
         raise RuntimeError(f"Stooq request failed for {ticker}") from e
 
     if not response.text.strip():
-        raise ValueError(f"No Stooq data returned for {ticker}")
+        raise NoMarketDataError(f"No Stooq data returned for {ticker}")
 
     try:
         df = pd.read_csv(io.StringIO(response.text))
@@ -276,7 +620,7 @@ def download_stooq_data(
         raise RuntimeError(f"Failed to parse Stooq CSV for {ticker}") from e
 
     if df.empty:
-        raise ValueError(f"Empty Stooq dataset for {ticker}")
+        raise NoMarketDataError(f"Empty Stooq dataset for {ticker}")
 
     # Stooq returns columns:
     # Date,Open,High,Low,Close,Volume
@@ -0,0 +1,110 @@
+import random
+import time
+from threading import BoundedSemaphore, Lock
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from libb.other.types_file import MarketConfig
+
+# status codes worth retrying: rate limits and transient server errors
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+class HttpClient:
+    """
+    Shared HTTP client for the REST market data sources (Stooq, Finnhub,
+    Alpha Vantage).
+
+    - keep-alive connection pooling through one `requests.Session`
+    - (connect, read) timeouts on every request
+    - bounded retries with jittered exponential backoff for connection
+      errors, timeouts and retryable status codes (honours `Retry-After`)
+    - at most `max_per_host` requests in flight per host
+    """
+
+    def __init__(self, *, connect_timeout: float = 5.0, read_timeout: float = 30.0, max_retries: int = 3,
+                 backoff_base: float = 0.5, backoff_max: float = 8.0, max_per_host: int = 4, pool_size: int = 10):
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.max_per_host = max_per_host
+
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        self._session.mount("https://", adapter)
+        self._session.mount("http://", adapter)
+
+        self._host_limits: dict[str, BoundedSemaphore] = {}
+        self._host_limits_lock = Lock()
+
+    @classmethod
+    def from_config(cls, config: MarketConfig) -> "HttpClient":
+        return cls(
+            connect_timeout=config.http_connect_timeout,
+            read_timeout=config.http_read_timeout,
+            max_retries=config.http_max_retries,
+            max_per_host=config.http_max_per_host,
+        )
+
+    def _host_limit(self, url: str) -> BoundedSemaphore:
+        host = urlsplit(url).netloc
+        with self._host_limits_lock:
+            if host not in self._host_limits:
+                self._host_limits[host] = BoundedSemaphore(self.max_per_host)
+            return self._host_limits[host]
+
+    def _backoff(self, attempt: int, response: requests.Response | None = None) -> float:
+        if response is not None:
+            retry_after = response.headers.get("Retry-After", "")
+            if retry_after.isdigit():
+                return min(float(retry_after), self.backoff_max)
+        # full jitter keeps concurrent retries from synchronising
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def get(self, url: str, params: dict | None = None) -> requests.Response:
+        """
+        Send a GET request with pooling, timeouts and retries.
+
+        Returns the final response, which may still carry an error status
+        once retries are exhausted. Raises the last connection or timeout
+        error if no response was ever received.
+        """
+        for attempt in range(self.max_retries + 1):
+            try:
+                with self._host_limit(url):
+                    response = self._session.get(url, params=params, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt == self.max_retries:
+                    raise
+                time.sleep(self._backoff(attempt))
+                continue
+
+            if response.status_code in RETRY_STATUS_CODES and attempt < self.max_retries:
+                time.sleep(self._backoff(attempt, response))
+                continue
+            return response
+
+        raise RuntimeError(f"Request to {url} exhausted retries.")
+
+# ----------------------------------
+# Active Client
+# ----------------------------------
+
+_active_http_client: HttpClient | None = None
+_http_client_lock = Lock()
+
+def get_http_client() -> HttpClient:
+    """Return the process-wide HTTP client, built from `MarketConfig` on first use."""
+    global _active_http_client
+    with _http_client_lock:
+        if _active_http_client is None:
+            _active_http_client = HttpClient.from_config(MarketConfig.from_env())
+        return _active_http_client
+
+def set_http_client(client: HttpClient | None) -> None:
+    """Override the process-wide HTTP client. Pass None to rebuild it from `MarketConfig`."""
+    global _active_http_client
+    with _http_client_lock:
+        _active_http_client = client
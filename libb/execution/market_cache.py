@@ -0,0 +1,405 @@
+import json
+import os
+import time
+import importlib.util
+from pathlib import Path
+from datetime import date
+from typing import Callable, cast
+
+import pandas as pd
+
+from libb.other.types_file import MarketConfig, MarketDataObject, MarketHistoryObject
+
+OHLCV_COLUMNS = ["Open", "High", "Low", "Close", "Volume"]
+
+# ----------------------------------
+# MarketHistoryObject <-> DataFrame
+# ----------------------------------
+
+def _empty_frame() -> pd.DataFrame:
+    return pd.DataFrame(columns=OHLCV_COLUMNS, index=pd.DatetimeIndex([], name="Date"))
+
+def history_to_frame(data: MarketHistoryObject) -> pd.DataFrame:
+    """Collect the OHLCV series of a MarketHistoryObject into one date-indexed frame."""
+    df = pd.DataFrame({col: data[col] for col in OHLCV_COLUMNS})
+    df.index = pd.DatetimeIndex(df.index).normalize()
+    df.index.name = "Date"
+    return df
+
+def frame_to_history(df: pd.DataFrame, ticker: str, start_date: date | str, end_date: date | str) -> MarketHistoryObject:
+    """Inverse of `history_to_frame()`."""
+    data: MarketHistoryObject = {
+        "Low": df["Low"],
+        "High": df["High"],
+        "Close": df["Close"],
+        "Open": df["Open"],
+        "Volume": df["Volume"].astype(int),
+        "Ticker": ticker,
+        "start_date": str(start_date),
+        "end_date": str(end_date),
+    }
+    return data
+
+# ----------------------------------
+# Persistent OHLCV Cache
+# ----------------------------------
+
+class OHLCVCache:
+    """
+    Persistent per-ticker cache of daily OHLCV bars.
+
+    Every ticker is stored as one columnar file (Parquet when `pyarrow` is
+    installed, CSV otherwise) next to a small JSON sidecar listing the date
+    intervals the file is known to cover. A covered interval may contain no
+    bars at all (weekends, holidays), so gaps are tracked by coverage rather
+    than by the rows present.
+
+    Only completed sessions are recorded as covered: bars dated today or
+    later are returned to the caller but re-fetched on the next request.
+
+    yfinance bars are dividend and split adjusted, so past prices shift
+    whenever a new corporate action is applied. Before new bars are merged,
+    one cached bar (the anchor) is downloaded again: as part of the gap
+    download when it lies within `ANCHOR_MAX_DAYS` of the gap, otherwise on
+    its own. If its close no longer matches, the ticker's bars are dropped
+    and the requested range is downloaded again on one price basis. The
+    sidecar records when the bars were last confirmed current; once that is
+    older than `max_age` seconds the same one-bar check is repeated before
+    the cache is used.
+    """
+
+    # how far (in calendar days) an anchor bar may sit from a gap and still be downloaded with it
+    ANCHOR_MAX_DAYS = 7
+
+    def __init__(self, root: Path, max_age: float | None = None):
+        self.root = Path(root)
+        self.max_age = max_age
+        self.use_parquet = importlib.util.find_spec("pyarrow") is not None
+
+    # ----------------------------------
+    # File Helpers
+    # ----------------------------------
+
+    def _file_stem(self, ticker: str) -> str:
+        return ticker.upper().replace("/", "_").replace("\\", "_")
+
+    def _data_path(self, ticker: str) -> Path:
+        suffix = "parquet" if self.use_parquet else "csv"
+        return self.root / f"{self._file_stem(ticker)}.{suffix}"
+
+    def _coverage_path(self, ticker: str) -> Path:
+        return self.root / f"{self._file_stem(ticker)}.json"
+
+    def _read_sidecar(self, ticker: str) -> tuple[list[tuple[pd.Timestamp, pd.Timestamp]], float]:
+        """Covered intervals and the time the bars were last confirmed current (0 if unknown)."""
+        with open(self._coverage_path(ticker), "r") as f:
+            raw = json.load(f)
+        # sidecars written before fetched_at was recorded are a bare interval list
+        if isinstance(raw, list):
+            raw = {"coverage": raw, "fetched_at": 0.0}
+        coverage = [(pd.Timestamp(start), pd.Timestamp(end)) for start, end in raw["coverage"]]
+        return coverage, float(raw.get("fetched_at", 0.0))
+
+    def _is_stale(self, fetched_at: float) -> bool:
+        return self.max_age is not None and time.time() - fetched_at > self.max_age
+
+    def load_entry(self, ticker: str) -> tuple[pd.DataFrame, list[tuple[pd.Timestamp, pd.Timestamp]], float]:
+        """Return the cached bars, covered intervals and `fetched_at` time for a ticker."""
+        data_path = self._data_path(ticker)
+        coverage_path = self._coverage_path(ticker)
+        if not data_path.exists() or not coverage_path.exists():
+            return _empty_frame(), [], 0.0
+        try:
+            if self.use_parquet:
+                df = pd.read_parquet(data_path)
+            else:
+                df = pd.read_csv(data_path, index_col="Date", parse_dates=["Date"])
+            coverage, fetched_at = self._read_sidecar(ticker)
+        except Exception as e:
+            print(f"Ignoring unreadable market data cache for {ticker}: {e}")
+            return _empty_frame(), [], 0.0
+        return df, coverage, fetched_at
+
+    def load(self, ticker: str) -> tuple[pd.DataFrame, list[tuple[pd.Timestamp, pd.Timestamp]]]:
+        """Return the cached bars and covered intervals for a ticker."""
+        df, coverage, _ = self.load_entry(ticker)
+        return df, coverage
+
+    def store(self, ticker: str, df: pd.DataFrame, coverage: list[tuple[pd.Timestamp, pd.Timestamp]],
+              fetched_at: float | None = None) -> None:
+        """Write bars and coverage for a ticker. Each file is replaced atomically.
+        `fetched_at` defaults to now."""
+        self.root.mkdir(parents=True, exist_ok=True)
+        data_path = self._data_path(ticker)
+        tmp_data_path = data_path.with_name(data_path.name + f".{os.getpid()}.tmp")
+        if self.use_parquet:
+            df.to_parquet(tmp_data_path)
+        else:
+            df.to_csv(tmp_data_path, index_label="Date")
+        os.replace(tmp_data_path, data_path)
+
+        coverage_path = self._coverage_path(ticker)
+        tmp_coverage_path = coverage_path.with_name(coverage_path.name + f".{os.getpid()}.tmp")
+        with open(tmp_coverage_path, "w") as f:
+            json.dump({"fetched_at": time.time() if fetched_at is None else fetched_at,
+                       "coverage": [[str(start.date()), str(end.date())] for start, end in coverage]}, f)
+        os.replace(tmp_coverage_path, coverage_path)
+
+    # ----------------------------------
+    # Coverage Helpers
+    # ----------------------------------
+
+    @staticmethod
+    def missing_ranges(coverage: list[tuple[pd.Timestamp, pd.Timestamp]], start: pd.Timestamp,
+                       end: pd.Timestamp) -> list[tuple[pd.Timestamp, pd.Timestamp]]:
+        """Return the sub-ranges of [start, end] not covered by any interval."""
+        one_day = pd.Timedelta(days=1)
+        gaps = []
+        cursor = start
+        for covered_start, covered_end in sorted(coverage):
+            if covered_end < cursor:
+                continue
+            if covered_start > end:
+                break
+            if covered_start > cursor:
+                gaps.append((cursor, covered_start - one_day))
+            cursor = max(cursor, covered_end + one_day)
+            if cursor > end:
+                return gaps
+        if cursor <= end:
+            gaps.append((cursor, end))
+        return gaps
+
+    @staticmethod
+    def merge_coverage(coverage: list[tuple[pd.Timestamp, pd.Timestamp]]) -> list[tuple[pd.Timestamp, pd.Timestamp]]:
+        """Merge overlapping or adjacent intervals."""
+        one_day = pd.Timedelta(days=1)
+        merged: list[tuple[pd.Timestamp, pd.Timestamp]] = []
+        for start, end in sorted(coverage):
+            if merged and start <= merged[-1][1] + one_day:
+                merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+            else:
+                merged.append((start, end))
+        return merged
+
+    # ----------------------------------
+    # Range Access
+    # ----------------------------------
+
+    def is_covered(self, ticker: str, start_date: date | str, end_date: date | str) -> bool:
+        """Return True if [start_date, end_date] can be served without downloading."""
+        coverage_path = self._coverage_path(ticker)
+        if not coverage_path.exists() or not self._data_path(ticker).exists():
+            return False
+        try:
+            coverage, fetched_at = self._read_sidecar(ticker)
+        except Exception:
+            return False
+        if self._is_stale(fetched_at):
+            return False
+        start = pd.Timestamp(start_date).normalize()
+        end = pd.Timestamp(end_date).normalize()
+        return not self.missing_ranges(coverage, start, end)
+
+    @staticmethod
+    def _anchor_date(cached: pd.DataFrame, gap_start: pd.Timestamp, gap_end: pd.Timestamp) -> pd.Timestamp | None:
+        """The cached bar next to a gap (the last one before it, else the first one after it)."""
+        before = cached.index[cached.index < gap_start]
+        if len(before):
+            return before[-1]
+        after = cached.index[cached.index > gap_end]
+        return after[0] if len(after) else None
+
+    @staticmethod
+    def _same_basis(cached: pd.DataFrame, fetched: pd.DataFrame, anchor: pd.Timestamp) -> bool | None:
+        """Whether the re-downloaded anchor bar has the cached close; None if it was not in the download."""
+        if anchor not in fetched.index:
+            # e.g. a batch download that stops short of the anchor
+            return None
+        old_close = float(cached.at[anchor, "Close"])
+        new_close = float(fetched.at[anchor, "Close"])
+        return abs(old_close - new_close) <= 1e-9 * max(1.0, abs(old_close))
+
+    def _check_anchor(self, ticker: str, cached: pd.DataFrame, anchor: pd.Timestamp,
+                      fetch: Callable[[str, pd.Timestamp, pd.Timestamp], MarketHistoryObject]) -> bool | None:
+        """Download the anchor bar on its own and compare it; None if that download fails."""
+        try:
+            fetched = history_to_frame(fetch(ticker, anchor, anchor))
+        except Exception as e:
+            print(f"Could not check the cached price basis of {ticker} on {anchor.date()}: {e}")
+            return None
+        return self._same_basis(cached, fetched, anchor)
+
+    def get_range(self, ticker: str, start_date: date | str, end_date: date | str,
+                  fetch: Callable[[str, pd.Timestamp, pd.Timestamp], MarketHistoryObject]) -> MarketHistoryObject:
+        """
+        Serve [start_date, end_date] from the cache, calling `fetch` only for
+        uncovered gaps and merging the results back to disk.
+
+        The cached price basis is checked against an anchor bar (see
+        `_anchor_date()`) before gap bars are merged, and before a stale
+        cache is used. If the anchor's close changed, the cached bars are
+        discarded and [start_date, end_date] is fetched whole; if that fetch
+        fails, the cached bars are served without the new ones.
+
+        Raises the last fetch error if no bars exist for the requested range.
+        """
+        start = pd.Timestamp(start_date).normalize()
+        end = pd.Timestamp(end_date).normalize()
+        # bars before today belong to closed sessions and only change through adjustments
+        last_final_day = pd.Timestamp.now().normalize() - pd.Timedelta(days=1)
+        anchor_reach = pd.Timedelta(days=self.ANCHOR_MAX_DAYS)
+
+        cached, coverage, fetched_at = self.load_entry(ticker)
+        new_frames = []
+        new_coverage = []
+        last_error: Exception | None = None
+        # whether a download showed the cached bars to be on the current basis
+        confirmed = cached.empty
+        rebased = False
+
+        if not cached.empty and self._is_stale(fetched_at):
+            # re-check one bar instead of discarding the history
+            in_request = cached.index[cached.index <= end]
+            anchor = in_request[-1] if len(in_request) else cached.index[0]
+            same_basis = self._check_anchor(ticker, cached, anchor, fetch)
+            rebased = same_basis is False
+            confirmed = bool(same_basis)
+
+        gaps = [] if rebased else self.missing_ranges(coverage, start, end)
+        for gap_start, gap_end in gaps:
+            if pd.bdate_range(gap_start, gap_end).empty:
+                # weekend-only gap: nothing to download
+                if gap_end <= last_final_day:
+                    new_coverage.append((gap_start, gap_end))
+                continue
+            anchor = self._anchor_date(cached, gap_start, gap_end)
+            nearby = anchor is not None and gap_start - anchor_reach <= anchor <= gap_end + anchor_reach
+            fetch_start, fetch_end = gap_start, gap_end
+            if nearby:
+                fetch_start, fetch_end = min(gap_start, anchor), max(gap_end, anchor)
+            try:
+                fetched = history_to_frame(fetch(ticker, fetch_start, fetch_end))
+            except Exception as e:
+                print(f"Failed to fill market data gap {gap_start.date()} to {gap_end.date()} for {ticker}: {e}")
+                last_error = e
+                continue
+            same_basis = None
+            if nearby:
+                same_basis = self._same_basis(cached, fetched, anchor)
+            elif anchor is not None and not confirmed:
+                same_basis = self._check_anchor(ticker, cached, anchor, fetch)
+            if same_basis is False:
+                rebased = True
+                break
+            confirmed = confirmed or bool(same_basis)
+            new_frames.append(fetched.loc[(fetched.index >= gap_start) & (fetched.index <= gap_end)])
+            if gap_start <= last_final_day:
+                new_coverage.append((gap_start, min(gap_end, last_final_day)))
+
+        if rebased:
+            print(f"Adjusted prices for {ticker} changed since they were cached (dividend or split); "
+                  f"re-downloading {start.date()} to {end.date()}.")
+            try:
+                refetched = history_to_frame(fetch(ticker, start, end)).sort_index()
+            except Exception as e:
+                # the cached bars are still consistent with each other; serve them unmerged
+                print(f"Failed to re-download market data for {ticker}; serving cached bars: {e}")
+                last_error = e
+            else:
+                cached = refetched
+                coverage = [(start, min(end, last_final_day))] if start <= last_final_day else []
+                try:
+                    self.store(ticker, cached, coverage)
+                except Exception as e:
+                    print(f"Failed to update market data cache for {ticker}: {e}")
+        elif new_frames or new_coverage or (confirmed and not cached.empty):
+            frames = [cached, *new_frames] if not cached.empty else new_frames
+            merged = pd.concat(frames) if frames else cached
+            merged = merged[~merged.index.duplicated(keep="last")].sort_index()
+            coverage = self.merge_coverage(coverage + new_coverage)
+            try:
+                self.store(ticker, merged, coverage, fetched_at=None if confirmed else fetched_at)
+            except Exception as e:
+                print(f"Failed to update market data cache for {ticker}: {e}")
+            cached = merged
+
+        in_range = cached.loc[(cached.index >= start) & (cached.index <= end)]
+        if in_range.empty:
+            if last_error is not None:
+                raise last_error
+            raise RuntimeError(
+                f"No market data available for {ticker} between {start.date()} and {end.date()}. "
+                "Market may have been closed (weekend or holiday)."
+            )
+        return frame_to_history(in_range, ticker, start_date, end_date)
+
+# ----------------------------------
+# Active Cache
+# ----------------------------------
+
+_active_market_cache: OHLCVCache | None = None
+_market_cache_configured = False
+
+def get_market_cache() -> OHLCVCache | None:
+    """Return the process-wide OHLCV cache, built from `MarketConfig` on first use."""
+    global _active_market_cache, _market_cache_configured
+    if not _market_cache_configured:
+        config = MarketConfig.from_env()
+        # offline runs read only their local data so results stay reproducible
+        use_cache = config.cache_dir is not None and not config.offline
+        max_age = config.cache_max_age_days * 86400 if config.cache_max_age_days is not None else None
+        _active_market_cache = OHLCVCache(config.cache_dir / "ohlcv", max_age=max_age) if use_cache else None
+        _market_cache_configured = True
+    return _active_market_cache
+
+def set_market_cache(cache: OHLCVCache | None) -> None:
+    """Override the process-wide OHLCV cache. Pass None to disable caching."""
+    global _active_market_cache, _market_cache_configured
+    _active_market_cache = cache
+    _market_cache_configured = True
+
+# ----------------------------------
+# Run-Scoped Snapshot Cache
+# ----------------------------------
+
+class MarketSnapshotCache:
+    """
+    In-memory cache of single-day snapshots keyed by (ticker, date).
+
+    Owned by `Processing` for the duration of one run so buys, sells,
+    stop-loss checks and mark-to-market share one download per held ticker.
+    """
+
+    def __init__(self):
+        self._snapshots: dict[tuple[str, date], MarketDataObject] = {}
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(ticker: str, day: date | str) -> tuple[str, date]:
+        return ticker.upper(), pd.Timestamp(day).date()
+
+    def get(self, ticker: str, day: date | str) -> MarketDataObject | None:
+        snapshot = self._snapshots.get(self._key(ticker, day))
+        if snapshot is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return cast(MarketDataObject, dict(snapshot))
+
+    def put(self, ticker: str, day: date | str, snapshot: MarketDataObject) -> None:
+        self._snapshots[self._key(ticker, day)] = snapshot
+
+    def stats(self) -> tuple[int, int]:
+        """Return (hits, misses)."""
+        return self.hits, self.misses
+
+_active_snapshot_cache: MarketSnapshotCache | None = None
+
+def get_snapshot_cache() -> MarketSnapshotCache | None:
+    return _active_snapshot_cache
+
+def set_snapshot_cache(cache: MarketSnapshotCache | None) -> None:
+    global _active_snapshot_cache
+    _active_snapshot_cache = cache
@@ -0,0 +1,141 @@
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from threading import Lock
+
+from libb.other.types_file import MarketConfig, NoMarketDataError
+
+LATENCY_SAMPLES = 50
+
+def is_data_miss(error: Exception | None) -> bool:
+    """A `NoMarketDataError` says the source is up but has no bars, so it never counts toward its circuit."""
+    return isinstance(error, NoMarketDataError)
+
+@dataclass
+class SourceHealth:
+    consecutive_failures: int = 0
+    total_successes: int = 0
+    total_failures: int = 0
+    total_misses: int = 0
+    opened_at: float | None = None      # monotonic time the circuit opened; None = closed
+    last_failure_at: float | None = None
+    last_error: str | None = None
+    latencies: deque[tuple[float, bool]] = field(default_factory=lambda: deque(maxlen=LATENCY_SAMPLES))
+
+class SourceHealthRegistry:
+    """
+    Tracks recent outcomes and latencies for each market data source.
+
+    After `failure_threshold` consecutive failures a source's circuit opens
+    and the source is skipped for `cooldown` seconds. Once the cool-down has
+    passed the source is tried again; a success closes the circuit, another
+    failure re-opens it for a further cool-down. Data misses (see
+    `is_data_miss()`) are counted separately and leave the circuit alone.
+    """
+
+    def __init__(self, failure_threshold: int = 3, cooldown: float = 300.0):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self._health: dict[str, SourceHealth] = {}
+        self._lock = Lock()
+
+    def record(self, source: str, seconds: float, succeeded: bool, error: Exception | None = None) -> None:
+        with self._lock:
+            health = self._health.setdefault(source, SourceHealth())
+            if not succeeded and is_data_miss(error):
+                # the source answered, so the sample still reflects its latency
+                health.latencies.append((seconds, True))
+                health.total_misses += 1
+                health.last_error = str(error)
+                return
+            health.latencies.append((seconds, succeeded))
+            if succeeded:
+                health.total_successes += 1
+                health.consecutive_failures = 0
+                health.opened_at = None
+                return
+
+            health.total_failures += 1
+            health.consecutive_failures += 1
+            health.last_error = str(error) if error is not None else None
+            health.last_failure_at = time.monotonic()
+            if health.consecutive_failures >= self.failure_threshold:
+                if health.opened_at is None:
+                    print(f"Data source {source} failed {health.consecutive_failures} times in a row; "
+                          f"skipping it for {self.cooldown:g}s.")
+                health.opened_at = time.monotonic()
+
+    def is_available(self, source: str) -> bool:
+        """Return False while the source's circuit is open."""
+        with self._lock:
+            health = self._health.get(source)
+            if health is None or health.opened_at is None:
+                return True
+            return time.monotonic() - health.opened_at >= self.cooldown
+
+    def order(self, sources: list[str]) -> list[str]:
+        """
+        Order sources by measured health, keeping configured priority among
+        equally healthy ones. Recent consecutive failures push a source back;
+        once `cooldown` seconds pass without a failure it regains its
+        configured place. Sources with an open circuit are dropped unless
+        every source is open, in which case all are returned in their
+        configured order.
+        """
+        available = [source for source in sources if self.is_available(source)]
+        if not available:
+            return list(sources)
+        now = time.monotonic()
+        with self._lock:
+            failures = {}
+            for source in available:
+                health = self._health.get(source)
+                recent = health is not None and health.last_failure_at is not None \
+                    and now - health.last_failure_at < self.cooldown
+                failures[source] = health.consecutive_failures if recent else 0
+        return sorted(available, key=lambda source: failures[source])
+
+    def latencies(self) -> dict[str, list[tuple[float, bool]]]:
+        with self._lock:
+            return {source: list(health.latencies) for source, health in self._health.items()}
+
+    def summary(self) -> dict[str, dict]:
+        """Per-source diagnostics: counts, circuit state, mean successful latency and last error."""
+        with self._lock:
+            report = {}
+            for source, health in self._health.items():
+                successful = [seconds for seconds, succeeded in health.latencies if succeeded]
+                report[source] = {
+                    "successes": health.total_successes,
+                    "failures": health.total_failures,
+                    "misses": health.total_misses,
+                    "consecutive_failures": health.consecutive_failures,
+                    "circuit_open": health.opened_at is not None
+                                    and time.monotonic() - health.opened_at < self.cooldown,
+                    "mean_latency_seconds": sum(successful) / len(successful) if successful else None,
+                    "last_error": health.last_error,
+                }
+            return report
+
+# ----------------------------------
+# Active Registry
+# ----------------------------------
+
+_active_registry: SourceHealthRegistry | None = None
+_registry_lock = Lock()
+
+def get_source_health() -> SourceHealthRegistry:
+    """Return the process-wide registry, built from `MarketConfig` on first use."""
+    global _active_registry
+    with _registry_lock:
+        if _active_registry is None:
+            config = MarketConfig.from_env()
+            _active_registry = SourceHealthRegistry(failure_threshold=config.circuit_failure_threshold,
+                                                    cooldown=config.circuit_cooldown)
+        return _active_registry
+
+def set_source_health(registry: SourceHealthRegistry | None) -> None:
+    """Replace the process-wide registry. Pass None to reset it."""
+    global _active_registry
+    with _registry_lock:
+        _active_registry = registry
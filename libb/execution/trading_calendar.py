@@ -0,0 +1,234 @@
+import datetime as dt
+import time
+from importlib import metadata
+from pathlib import Path
+from threading import Lock
+
+import numpy as np
+import pandas as pd
+
+from libb.other.types_file import MarketConfig
+
+_EPOCH = np.datetime64("1970-01-01", "D")
+_EPOCH_ORDINAL = dt.date(1970, 1, 1).toordinal()
+DEFAULT_CALENDAR_START = dt.date(1990, 1, 1)
+CALENDAR_FILE_NAME = "nyse.npz"
+
+def _mcal_version() -> str:
+    try:
+        return metadata.version("pandas_market_calendars")
+    except metadata.PackageNotFoundError:
+        return ""
+
+def _to_day_numbers(dates) -> np.ndarray:
+    """Days since 1970-01-01 for a date, string, Timestamp or array of them."""
+    if np.ndim(dates) == 0:
+        index = pd.DatetimeIndex([pd.Timestamp(dates)])
+    else:
+        index = pd.DatetimeIndex(pd.to_datetime(dates))
+    if index.tz is not None:
+        index = index.tz_localize(None)
+    return (index.normalize().values.astype("datetime64[D]") - _EPOCH).astype(np.int64)
+
+def _as_date(value: dt.date | str) -> dt.date:
+    if isinstance(value, dt.datetime):
+        return value.date()
+    if isinstance(value, dt.date):
+        return value
+    return pd.Timestamp(value).date()
+
+class TradingCalendar:
+    """
+    Precomputed NYSE trading days over a fixed span.
+
+    Sessions are stored as a boolean array with one slot per calendar day
+    from `start` to `end`, so `is_open()` is a single array lookup for one
+    date and one vectorized gather for many. The session list can be saved
+    to and loaded from a `.npy` file so the exchange calendar only has to be
+    evaluated once per span; `built_at` and `mcal_version` record when and
+    with which `pandas_market_calendars` it was evaluated, so a saved copy
+    can be judged stale.
+    """
+
+    def __init__(self, sessions: np.ndarray, start: dt.date, end: dt.date,
+                 built_at: float | None = None, mcal_version: str | None = None):
+        self.start = start
+        self.end = end
+        self.built_at = built_at
+        self.mcal_version = mcal_version
+        self._first_day = int(_to_day_numbers(start)[0])
+        self._last_day = int(_to_day_numbers(end)[0])
+        self.sessions = np.sort(np.asarray(sessions, dtype=np.int64))
+
+        self._open = np.zeros(self._last_day - self._first_day + 1, dtype=bool)
+        self._open[self.sessions - self._first_day] = True
+
+    @classmethod
+    def build(cls, start: dt.date, end: dt.date) -> "TradingCalendar":
+        """Evaluate the NYSE calendar for [start, end]."""
+        import pandas_market_calendars as mcal
+        valid_days = mcal.get_calendar("NYSE").valid_days(start_date=start, end_date=end)
+        return cls(_to_day_numbers(valid_days), start, end, built_at=time.time(), mcal_version=_mcal_version())
+
+    @classmethod
+    def load(cls, path: Path) -> "TradingCalendar":
+        with np.load(path) as data:
+            return cls(data["sessions"], dt.date.fromisoformat(str(data["start"])),
+                       dt.date.fromisoformat(str(data["end"])), built_at=float(data["built_at"]),
+                       mcal_version=str(data["mcal_version"]))
+
+    def save(self, root: Path) -> Path:
+        """Write the calendar to `<root>/nyse.npz`, replacing any earlier copy."""
+        root.mkdir(parents=True, exist_ok=True)
+        path = root / CALENDAR_FILE_NAME
+        tmp_path = root / "nyse.tmp.npz"   # np.savez appends .npz to names without it
+        np.savez(tmp_path, sessions=self.sessions, start=np.array(str(self.start)), end=np.array(str(self.end)),
+                 built_at=np.array(self.built_at if self.built_at is not None else time.time()),
+                 mcal_version=np.array(self.mcal_version or ""))
+        tmp_path.replace(path)
+        # one file per calendar: drop the per-span files earlier versions wrote
+        for stale_path in root.glob("nyse_*.npy"):
+            stale_path.unlink(missing_ok=True)
+        return path
+
+    def covers(self, start: dt.date, end: dt.date) -> bool:
+        return self.start <= start and end <= self.end
+
+    def is_stale(self, max_age: float) -> bool:
+        """True once the calendar is older than `max_age` seconds or was built with another `pandas_market_calendars`."""
+        if self.built_at is None or time.time() - self.built_at > max_age:
+            return True
+        return self.mcal_version != _mcal_version()
+
+    def _is_open_day(self, day: int) -> bool:
+        if day < self._first_day or day > self._last_day:
+            raise ValueError(f"Date outside the trading calendar span {self.start} to {self.end}.")
+        return bool(self._open[day - self._first_day])
+
+    def is_open(self, dates):
+        """
+        Return whether the NYSE is open on `dates`.
+
+        A single date returns a bool; a list, array or index of dates returns
+        a boolean numpy array. Raises ValueError for dates outside the span.
+        """
+        if isinstance(dates, dt.date):
+            # covers datetime and pd.Timestamp too; skips the array conversion
+            return self._is_open_day(dates.toordinal() - _EPOCH_ORDINAL)
+        days = _to_day_numbers(dates)
+        if days.size and (days.min() < self._first_day or days.max() > self._last_day):
+            raise ValueError(f"Date outside the trading calendar span {self.start} to {self.end}.")
+        result = self._open[days - self._first_day]
+        if np.ndim(dates) == 0:
+            return bool(result[0])
+        return result
+
+    # ----------------------------------
+    # Navigation
+    # ----------------------------------
+
+    @staticmethod
+    def _to_date(day: int) -> dt.date:
+        return dt.date.fromordinal(int(day) + _EPOCH_ORDINAL)
+
+    def next_session(self, date: dt.date | str) -> dt.date:
+        """First trading day strictly after `date`."""
+        position = np.searchsorted(self.sessions, _as_date(date).toordinal() - _EPOCH_ORDINAL, side="right")
+        if position >= len(self.sessions):
+            raise ValueError(f"No trading day after {date} within the calendar span ending {self.end}.")
+        return self._to_date(self.sessions[position])
+
+    def previous_session(self, date: dt.date | str) -> dt.date:
+        """Last trading day strictly before `date`."""
+        position = np.searchsorted(self.sessions, _as_date(date).toordinal() - _EPOCH_ORDINAL, side="left")
+        if position == 0:
+            raise ValueError(f"No trading day before {date} within the calendar span starting {self.start}.")
+        return self._to_date(self.sessions[position - 1])
+
+    def _session_bounds(self, start: dt.date | str, end: dt.date | str) -> tuple[int, int]:
+        first = np.searchsorted(self.sessions, _as_date(start).toordinal() - _EPOCH_ORDINAL, side="left")
+        last = np.searchsorted(self.sessions, _as_date(end).toordinal() - _EPOCH_ORDINAL, side="right")
+        return int(first), int(max(first, last))
+
+    def sessions_between(self, start: dt.date | str, end: dt.date | str) -> list[dt.date]:
+        """Trading days in [start, end] inclusive, in order."""
+        first, last = self._session_bounds(start, end)
+        return [self._to_date(day) for day in self.sessions[first:last]]
+
+    def session_count(self, start: dt.date | str, end: dt.date | str) -> int:
+        """Number of trading days in [start, end] inclusive."""
+        first, last = self._session_bounds(start, end)
+        return last - first
+
+# ----------------------------------
+# Active Calendar
+# ----------------------------------
+
+_active_calendar: TradingCalendar | None = None
+_calendar_lock = Lock()
+
+def _load_or_build(start: dt.date, end: dt.date, cache_dir: Path | None, max_age: float) -> TradingCalendar:
+    """
+    Load the saved calendar if it covers [start, end] and is not stale.
+    Otherwise rebuild it over the union of both spans and save it over the
+    old file, so closures announced since the last build are picked up.
+    """
+    root = cache_dir / "calendar" if cache_dir is not None else None
+    path = root / CALENDAR_FILE_NAME if root is not None else None
+    if path is not None and path.exists():
+        try:
+            saved = TradingCalendar.load(path)
+        except Exception as e:
+            print(f"Ignoring unreadable trading calendar {path}: {e}")
+        else:
+            if saved.covers(start, end) and not saved.is_stale(max_age):
+                return saved
+            start, end = min(start, saved.start), max(end, saved.end)
+
+    calendar = TradingCalendar.build(start, end)
+    if root is not None:
+        try:
+            calendar.save(root)
+        except Exception as e:
+            print(f"Failed to persist trading calendar: {e}")
+    return calendar
+
+def get_trading_calendar(start: dt.date | str | None = None, end: dt.date | str | None = None) -> TradingCalendar:
+    """
+    Return the process-wide trading calendar, built on first use over the
+    span configured in `MarketConfig` (`LIBB_CALENDAR_START` /
+    `LIBB_CALENDAR_END`). If `start`/`end` fall outside the current span it
+    is widened to include them.
+    """
+    global _active_calendar
+    start = _as_date(start) if start is not None else None
+    end = _as_date(end) if end is not None else None
+
+    calendar = _active_calendar
+    if calendar is not None and calendar.covers(start or calendar.start, end or calendar.end):
+        return calendar
+
+    with _calendar_lock:
+        if _active_calendar is not None:
+            want_start, want_end = _active_calendar.start, _active_calendar.end
+        else:
+            config = MarketConfig.from_env()
+            # default span: 1990 through the end of next year
+            want_start = config.calendar_start or DEFAULT_CALENDAR_START
+            want_end = config.calendar_end or dt.date(dt.date.today().year + 1, 12, 31)
+        if start is not None:
+            want_start = min(want_start, start)
+        if end is not None:
+            want_end = max(want_end, end)
+
+        if _active_calendar is None or not _active_calendar.covers(want_start, want_end):
+            config = MarketConfig.from_env()
+            _active_calendar = _load_or_build(want_start, want_end, config.cache_dir,
+                                              config.calendar_max_age_days * 86400)
+        return _active_calendar
+
+def set_trading_calendar(calendar: TradingCalendar | None) -> None:
+    """Replace the process-wide calendar. Pass None to rebuild it on next use."""
+    global _active_calendar
+    with _calendar_lock:
+        _active_calendar = calendar
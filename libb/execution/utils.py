@@ -2,29 +2,147 @@ import pandas as pd
 from pathlib import Path
 from ..other.types_file import Order
 import datetime as dt
-import pandas_market_calendars as mcal
 import math
+import csv
+import os
+from typing import cast
+from libb.execution.trading_calendar import get_trading_calendar
+from libb.core.storage import append_table, is_indexed_table, record_csv_append
 
 def load_df(path: Path) -> pd.DataFrame:
     if not path.exists():
         return pd.DataFrame()
     return pd.read_csv(path)
 
+# path -> (file identity when the header was last confirmed, header columns)
+_header_cache: dict[str, tuple[tuple[int, int, int, int], list[str]]] = {}
+
+def _file_identity(path: Path) -> tuple[int, int, int, int]:
+    stat = os.stat(path)
+    return stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+def read_header(path: Path) -> list[str]:
+    """
+    Return the column names of a CSV file by reading its first line only.
+
+    Headers are cached per path and reused while the file is unchanged since
+    the last read or `append_log()`; any other modification re-reads the
+    first line. Returns an empty list for missing or empty files.
+    """
+    key = os.fspath(path)
+    try:
+        identity = _file_identity(path)
+    except FileNotFoundError:
+        _header_cache.pop(key, None)
+        return []
+    cached = _header_cache.get(key)
+    if cached is not None and cached[0] == identity:
+        return cached[1]
+
+    with open(path, "r", newline="", encoding="utf-8") as f:
+        header = next(csv.reader([f.readline()]), [])
+    _header_cache[key] = (identity, header)
+    return header
+
+class LogBuffer:
+    """
+    Holds `append_log()` rows for selected files in memory so they can be
+    written with one append per file.
+
+    While a buffer is active (see `set_log_buffer()`), appends to its paths
+    are queued instead of written. `flush()` formats every queued row exactly
+    as a direct append would and writes each file in a single call;
+    `discard()` drops the rows, leaving the files untouched.
+    """
+
+    def __init__(self, paths: list[Path]):
+        self._rows: dict[str, list[dict | pd.DataFrame]] = {os.fspath(path): [] for path in paths}
+
+    def buffers(self, path: Path) -> bool:
+        return os.fspath(path) in self._rows
+
+    def add(self, path: Path, row: dict | pd.DataFrame) -> None:
+        if not isinstance(row, (dict, pd.DataFrame)):
+            raise RuntimeError(f"Invalid data type given for append_log(): {type(row)}. Row must be either a DataFrame or dict.")
+        self._rows[os.fspath(path)].append(row)
+
+    def pending(self, path: Path) -> int:
+        return len(self._rows.get(os.fspath(path), []))
+
+    def flush(self) -> None:
+        for key, rows in self._rows.items():
+            if not rows:
+                continue
+            if Path(key).suffix != ".csv":
+                records = []
+                for row in rows:
+                    records.extend(row.to_dict("records") if isinstance(row, pd.DataFrame) else [row])
+                append_table(Path(key), pd.DataFrame(records))
+                rows.clear()
+                continue
+            columns = read_header(Path(key))
+            if not columns:
+                raise RuntimeError(f"Schema missing: header not initialized for {key}")
+            # format row by row so the output matches individual appends byte for byte
+            text = "".join(_format_rows(row, columns) for row in rows)
+            start = os.path.getsize(key)
+            with open(key, "a", newline="", encoding="utf-8") as f:
+                f.write(text)
+            if "date" in columns and is_indexed_table(key):
+                dates = [value for row in rows for value in (row.get("date", []) if isinstance(row, pd.DataFrame) else [row.get("date")])]
+                record_csv_append(Path(key), start, dates)
+            _header_cache[key] = (_file_identity(Path(key)), columns)
+            rows.clear()
+
+    def discard(self) -> None:
+        for rows in self._rows.values():
+            rows.clear()
+
+_active_log_buffer: LogBuffer | None = None
+
+def get_log_buffer() -> LogBuffer | None:
+    return _active_log_buffer
+
+def set_log_buffer(buffer: LogBuffer | None) -> None:
+    global _active_log_buffer
+    _active_log_buffer = buffer
+
+def _format_rows(row: dict | pd.DataFrame, columns: list[str]) -> str:
+    row_df = row if isinstance(row, pd.DataFrame) else pd.DataFrame([row])
+    return cast(str, row_df.reindex(columns=columns).to_csv(index=False, header=False))
+
 def append_log(path: Path, row: dict | pd.DataFrame) -> None:
-    df = load_df(path)
+    buffer = get_log_buffer()
+    if buffer is not None and buffer.buffers(path):
+        buffer.add(path, row)
+        return
+
+    if Path(path).suffix != ".csv":
+        if not isinstance(row, (dict, pd.DataFrame)):
+            raise RuntimeError(f"Invalid data type given for append_log(): {type(row)}. Row must be either a DataFrame or dict.")
+        append_table(path, row if isinstance(row, pd.DataFrame) else pd.DataFrame([row]))
+        return
+
+    columns = read_header(path)
 
-    if df.columns.empty:
+    if not columns:
         raise RuntimeError("Schema missing: header not initialized")
     
+    start = os.path.getsize(path)
     if isinstance(row, pd.DataFrame):
-        row = row.reindex(columns=df.columns)
-        row.to_csv(path, index=False, mode="a", header=False, encoding="utf-8",)
+        row_df = row.reindex(columns=columns)
+        row_df.to_csv(path, index=False, mode="a", header=False, encoding="utf-8",)
 
     elif isinstance (row, dict):
-        row_df = pd.DataFrame([row]).reindex(columns=df.columns)
+        row_df = pd.DataFrame([row]).reindex(columns=columns)
         row_df.to_csv(path, index=False, mode="a", header=False, encoding="utf-8",)
     else:
         raise RuntimeError(f"Invalid data type given for append_log(): {type(row)}. Row must be either a DataFrame or dict.")
+
+    if "date" in columns and is_indexed_table(path):
+        record_csv_append(path, start, row_df["date"])
+    # our own append leaves the header intact
+    _header_cache[os.fspath(path)] = (_file_identity(path), columns)
     return
 
 # TODO: Use enum codes for error reasoning instead of formatted strings
@@ -82,12 +200,14 @@ def catch_missing_order_data(order: Order, required_cols: list, trade_log_path:
 
     return True
 
-nyse = mcal.get_calendar("NYSE")
-
 def is_nyse_open(date: dt.date) -> bool:
     """
     Check if the NYSE is open on a given date.
 
+    Answered from the precomputed trading calendar (see
+    `libb.execution.trading_calendar`), which is built once per span and
+    persisted under the market data cache directory.
+
     Parameters
     ----------
     date : datetime.date
@@ -98,5 +218,30 @@ def is_nyse_open(date: dt.date) -> bool:
     bool
         True if NYSE is open, False otherwise.
     """
-    schedule = nyse.schedule(start_date=date, end_date=date)
-    return not schedule.empty
\ No newline at end of file
+    return get_trading_calendar(date, date).is_open(date)
+
+# a window wide enough to contain the nearest session on either side of any date
+_SESSION_SEARCH_WINDOW = dt.timedelta(days=30)
+
+def next_trading_day(date: dt.date | str) -> dt.date:
+    """Return the first NYSE trading day strictly after `date`."""
+    date = pd.Timestamp(date).date()
+    return get_trading_calendar(date, date + _SESSION_SEARCH_WINDOW).next_session(date)
+
+def previous_trading_day(date: dt.date | str) -> dt.date:
+    """Return the last NYSE trading day strictly before `date`."""
+    date = pd.Timestamp(date).date()
+    return get_trading_calendar(date - _SESSION_SEARCH_WINDOW, date).previous_session(date)
+
+def trading_days_between(start: dt.date | str, end: dt.date | str) -> list[dt.date]:
+    """
+    Return the NYSE trading days in [start, end] inclusive, in order.
+
+    Drivers such as backtests can iterate this directly instead of walking
+    calendar days and skipping closed ones.
+    """
+    return get_trading_calendar(start, end).sessions_between(start, end)
+
+def count_trading_days(start: dt.date | str, end: dt.date | str) -> int:
+    """Return the number of NYSE trading sessions in [start, end] inclusive."""
+    return get_trading_calendar(start, end).session_count(start, end)
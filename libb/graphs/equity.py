@@ -1,5 +1,6 @@
 import matplotlib.pyplot as plt
-from libb.execution.get_market_data import download_data_on_given_range
+from libb.metrics.baseline import get_baseline_closes
+from libb.core.storage import read_typed_table
 import pandas as pd
 
 def download_baseline(portfolio_df: pd.DataFrame, ticker: str, start_date: pd.Timestamp, end_date: pd.Timestamp) -> pd.DataFrame:
@@ -7,10 +8,8 @@ def download_baseline(portfolio_df: pd.DataFrame, ticker: str, start_date: pd.Ti
 
     starting_capital = portfolio_df["equity"].iloc[0]
 
-    baseline = download_data_on_given_range(ticker, start_date, end_date)
-    if baseline is None:
-        raise RuntimeError(f"Data sources returned None while downloading baseline data (ticker: {ticker}). Check your internet or try again later.")    
-    baseline_df = pd.DataFrame({"Close": baseline["Close"], "Date": baseline["Close"].index}).reset_index(drop=True)
+    baseline = get_baseline_closes(ticker, start_date, end_date)
+    baseline_df = pd.DataFrame({"Close": baseline, "Date": baseline.index}).reset_index(drop=True)
     starting_price = baseline_df.loc[baseline_df.index[0], "Close"]
 
     scaling_factor = starting_capital / starting_price
@@ -19,8 +18,7 @@ def download_baseline(portfolio_df: pd.DataFrame, ticker: str, start_date: pd.Ti
 
 def plot_equity_vs_baseline(portfolio_path, baseline_ticker="^SPX") -> None:
     """Generate and display the comparison graph; return metrics."""
-    portfolio_history = pd.read_csv(portfolio_path)
-    portfolio_history["date"] = pd.to_datetime(portfolio_history["date"])
+    portfolio_history = read_typed_table(portfolio_path, "portfolio_history")
 
     start_date = portfolio_history["date"].iloc[0]
     end_date = portfolio_history["date"].iloc[-1]
@@ -84,8 +82,7 @@ def plot_equity_vs_baseline(portfolio_path, baseline_ticker="^SPX") -> None:
 
 def plot_equity(portfolio_path):
     """Generate and display the comparison graph; return metrics."""
-    portfolio_history = pd.read_csv(portfolio_path)
-    portfolio_history["date"] = pd.to_datetime(portfolio_history["date"])
+    portfolio_history = read_typed_table(portfolio_path, "portfolio_history")
 
     starting_equity = portfolio_history["equity"].iloc[0]
 
@@ -1,7 +1,7 @@
 import pandas as pd
 import matplotlib.pyplot as plt
-import json
 from pathlib import Path
+from libb.core.storage import read_records, read_typed_table
 
 
 def plot_equity_and_sentiment(
@@ -18,13 +18,11 @@ def plot_equity_and_sentiment(
     """
     plt.close("all")
     # --- Load portfolio CSV ---
-    portfolio = pd.read_csv(portfolio_csv)
-    portfolio["date"] = pd.to_datetime(portfolio["date"])
+    portfolio = read_typed_table(portfolio_csv, "portfolio_history")
     
 
-    # --- Load sentiment JSON ---
-    with open(sentiment_json, "r") as f:
-        sentiment_records = json.load(f)
+    # --- Load sentiment JSON Lines ---
+    sentiment_records = read_records(sentiment_json)
 
     sentiment = pd.DataFrame(sentiment_records)
     sentiment["date"] = pd.to_datetime(sentiment["date"])
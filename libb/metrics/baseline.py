@@ -0,0 +1,117 @@
+from datetime import date
+from threading import Lock
+
+import pandas as pd
+
+from libb.execution.get_market_data import download_data_on_given_range
+
+class BaselineCache:
+    """
+    In-process cache of benchmark closing prices (e.g. ^SPX) shared by the
+    performance metrics and the equity plots of every model in a process.
+
+    Each ticker keeps one close series and the date range it covers. A
+    request inside that range is answered by slicing; a request that reaches
+    past either end only downloads the missing days and extends the series.
+
+    Downloads are dividend and split adjusted, so each extension also
+    re-downloads the cached bar at the edge it extends. If that close
+    changed, the cached series is on an older price basis and the whole
+    window is downloaded again instead of being extended.
+    """
+
+    def __init__(self):
+        self._closes: dict[str, tuple[pd.Series, pd.Timestamp, pd.Timestamp]] = {}
+        self._lock = Lock()
+        self.downloads = 0
+
+    def _download(self, ticker: str, start: pd.Timestamp, end: pd.Timestamp) -> pd.Series | None:
+        if pd.bdate_range(start, end).empty:
+            return None
+        self.downloads += 1
+        closes = download_data_on_given_range(ticker, start, end)["Close"]
+        closes = closes.copy()
+        closes.index = pd.DatetimeIndex(closes.index).normalize()
+        return closes
+
+    @staticmethod
+    def _same_basis(closes: pd.Series, downloaded: pd.Series, anchor: pd.Timestamp) -> bool:
+        """False if the re-downloaded anchor close differs from the cached one."""
+        if anchor not in downloaded.index:
+            return True
+        cached_close = float(closes.loc[anchor])
+        return abs(cached_close - float(downloaded.loc[anchor])) <= 1e-9 * max(1.0, abs(cached_close))
+
+    def get_closes(self, ticker: str, start_date: date | str, end_date: date | str) -> pd.Series:
+        """Return daily closes for [start_date, end_date] inclusive."""
+        key = ticker.upper()
+        start = pd.Timestamp(start_date).normalize()
+        end = pd.Timestamp(end_date).normalize()
+
+        with self._lock:
+            cached = self._closes.get(key)
+            if cached is None:
+                closes = self._download(ticker, start, end)
+                if closes is None:
+                    raise RuntimeError(f"No baseline data for {ticker} between {start.date()} and {end.date()}.")
+                covered_start, covered_end = start, end
+            else:
+                closes, covered_start, covered_end = cached
+                want_start, want_end = min(start, covered_start), max(end, covered_end)
+                pieces = [closes]
+                rebased = False
+                # a failed extension (e.g. a holiday-only gap) keeps the cached series as is
+                if start < covered_start:
+                    try:
+                        anchor = closes.index[0]
+                        before = self._download(ticker, start, anchor)
+                        if before is not None:
+                            rebased = not self._same_basis(closes, before, anchor)
+                            pieces.insert(0, before.loc[before.index < anchor])
+                        covered_start = start
+                    except Exception as e:
+                        print(f"Failed to extend baseline {ticker} back to {start.date()}: {e}")
+                if end > covered_end and not rebased:
+                    try:
+                        anchor = closes.index[-1]
+                        after = self._download(ticker, anchor, end)
+                        if after is not None:
+                            rebased = not self._same_basis(closes, after, anchor)
+                            pieces.append(after.loc[after.index > anchor])
+                        covered_end = end
+                    except Exception as e:
+                        print(f"Failed to extend baseline {ticker} to {end.date()}: {e}")
+                if rebased:
+                    print(f"Adjusted closes for {ticker} changed since they were cached (dividend or split); "
+                          f"re-downloading {want_start.date()} to {want_end.date()}.")
+                    closes = self._download(ticker, want_start, want_end)
+                    if closes is None:
+                        raise RuntimeError(f"No baseline data for {ticker} between {want_start.date()} and {want_end.date()}.")
+                    covered_start, covered_end = want_start, want_end
+                elif len(pieces) > 1:
+                    closes = pd.concat(pieces)
+                    closes = closes[~closes.index.duplicated(keep="last")].sort_index()
+            self._closes[key] = (closes, covered_start, covered_end)
+
+        in_range = closes.loc[(closes.index >= start) & (closes.index <= end)]
+        if in_range.empty:
+            raise RuntimeError(f"No baseline data for {ticker} between {start.date()} and {end.date()}.")
+        return in_range
+
+# ----------------------------------
+# Active Cache
+# ----------------------------------
+
+_active_baseline_cache = BaselineCache()
+
+def get_baseline_cache() -> BaselineCache:
+    return _active_baseline_cache
+
+def set_baseline_cache(cache: BaselineCache) -> None:
+    """Replace the process-wide baseline cache, e.g. with a fresh one to force re-downloads."""
+    global _active_baseline_cache
+    _active_baseline_cache = cache
+
+def get_baseline_closes(ticker: str, start_date: date | str, end_date: date | str) -> pd.Series:
+    """Daily closes for a benchmark ticker, served from the process-wide `BaselineCache`."""
+    return get_baseline_cache().get_closes(ticker, start_date, end_date)
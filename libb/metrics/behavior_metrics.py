@@ -2,11 +2,12 @@ import pandas as pd
 from pathlib import Path
 from typing import Any
 from datetime import date
+from libb.core.storage import read_typed_table
 
 def load_behavioral_metrics_data(trade_df_path: Path | str, positions_df_path: Path | str, position_history_df_path: Path | str) -> tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
-    trade_df = pd.read_csv(trade_df_path)
-    positions_df = pd.read_csv(positions_df_path)
-    equity_df = pd.read_csv(position_history_df_path)
+    trade_df = read_typed_table(trade_df_path, "trade_log")
+    positions_df = read_typed_table(positions_df_path, "position_history")
+    equity_df = read_typed_table(position_history_df_path, "portfolio_history")
 
     df_dict: dict = {"trade_df": trade_df,
             "positions_df": positions_df,
@@ -52,8 +53,11 @@ def concentration_ratio(df_positions: pd.DataFrame, df_equity: pd.DataFrame) ->
         columns="ticker", 
         values="market_value", 
         aggfunc="sum",
-        fill_value=0
+        fill_value=0,
+        observed=True,
     )
+    # plain column labels, so the cash column below can be added
+    wide_positions.columns = wide_positions.columns.astype(str)
     
     equity_series = df_equity.set_index("date")["equity"]
     equity_series = equity_series.reindex(wide_positions.index)
@@ -169,8 +173,8 @@ def total_behavioral_metrics(trade_df_path: Path | str, positions_df_path: Path
             "total_rejected_buys": int(len(trade_df[(trade_df["action"] == "BUY") & (trade_df["status"] == "REJECTED")])),
             "total_rejected_sells": int(len(trade_df[(trade_df["action"] == "SELL") & (trade_df["status"] == "REJECTED")])),
 
-            "start_date": str(equity_df["date"].iloc[0]),
-            "end_date": str(equity_df["date"].iloc[-1]),
+            "start_date": str(equity_df["date"].iloc[0].date()),
+            "end_date": str(equity_df["date"].iloc[-1].date()),
             "observation_count": len(equity_df),
             "generated_at": str(date),
         }
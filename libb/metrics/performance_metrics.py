@@ -3,13 +3,14 @@ import pandas as pd
 import json
 from datetime import date
 from pathlib import Path
-import yfinance as yf
 from libb.other.config_setup import get_config
+from libb.metrics.baseline import get_baseline_closes
+from libb.core.storage import read_typed_table
 
 
 def load_performance_data(portfolio_history_path: Path | str, trade_log_path: Path | str, baseline_ticker: str) -> tuple[pd.DataFrame, pd.Series, pd.Series, pd.Series]:
-    raw_portfolio_log = pd.read_csv(portfolio_history_path, parse_dates=["date"])
-    raw_trade_log = pd.read_csv(trade_log_path)
+    raw_portfolio_log = read_typed_table(portfolio_history_path, "portfolio_history")
+    raw_trade_log = read_typed_table(trade_log_path, "trade_log")
     raw_portfolio_log = raw_portfolio_log.set_index("date")
 
     assert raw_portfolio_log.index.is_unique, "Duplicate processed dates within portfolio log."
@@ -20,11 +21,12 @@ def load_performance_data(portfolio_history_path: Path | str, trade_log_path: Pa
     first_date = raw_portfolio_log.index[0]
     last_date = raw_portfolio_log.index[-1]
 
-    baseline_data = yf.download(baseline_ticker, start=first_date, end=last_date + pd.Timedelta(days=1), auto_adjust=True, progress=False)
-    if baseline_data is None:
-        raise RuntimeError(f"Cannot generate performance metrics: ticker data {baseline_ticker} was type None.")
+    try:
+        baseline_closes = get_baseline_closes(baseline_ticker, first_date, last_date)
+    except Exception as e:
+        raise RuntimeError(f"Cannot generate performance metrics: no baseline data for {baseline_ticker}.") from e
 
-    baseline_return_pct = baseline_data["Close"].pct_change().dropna()
+    baseline_return_pct = baseline_closes.pct_change().dropna()
 
     portfolio_equity_series = raw_portfolio_log["equity"]
 
@@ -2,12 +2,13 @@ from pathlib import Path
 from datetime import date, datetime, UTC, time
 from zoneinfo import ZoneInfo
 from shutil import rmtree
+from functools import cached_property
 from typing import cast
 import json
 
 import pandas as pd
 
-from libb.other.types_file import ModelSnapshot, Log, DiskLayout, MarketDataObject, MarketHistoryObject
+from libb.other.types_file import IncrementalSnapshot, ModelSnapshot, Log, DiskLayout, MarketDataObject, MarketHistoryObject
 from libb.other.config_setup import verifiy_config, set_config
 
 from libb.execution.utils import is_nyse_open
@@ -15,15 +16,12 @@ from libb.execution.get_market_data import download_data_on_given_date, download
 
 from libb.user_data.logs import _recent_execution_logs
 
-from libb.graphs.sentiment import plot_equity_and_sentiment
-from libb.graphs.equity import plot_equity_vs_baseline, plot_equity
-
-from libb.metrics.performance_metrics import total_performance_calculations
-from libb.metrics.behavior_metrics import total_behavioral_metrics
-from libb.metrics.sentiment_metrics import analyze_sentiment
+# graphs and metrics pull in matplotlib and pysentiment2; they are imported
+# inside the methods that use them so processing-only runs never load them
 
 
 from libb.core.processing import Processing
+from libb.core.storage import TABLE_COLUMNS, commit_group, create_document, create_table, migrate_json_records, transaction
 from libb.core.writing_disk import DiskWriter
 from libb.core.reading_disk import DiskReader
 
@@ -52,11 +50,13 @@ class LIBBmodel:
         self.start_time = datetime.now(UTC)
 
         self.passed_verified_config: dict = verifiy_config(config)
+        # None when the backend came from the defaults rather than the caller
+        self._requested_backend: str | None = config.get("storage_backend") if isinstance(config, dict) else None
         self._root: Path = Path(model_path)
         self._model_path: str = str(model_path)
         self.run_date: date = run_date
 
-        self.layout: DiskLayout = DiskLayout.from_root(self._root)
+        self.layout: DiskLayout = DiskLayout.from_root(self._root, self._resolve_storage_backend())
 
         self.writer: DiskWriter = DiskWriter(layout=self.layout, run_date=self.run_date)
 
@@ -69,8 +69,10 @@ class LIBBmodel:
         self.filled_orders: int = 0
         self.failed_orders: int = 0
         self.skipped_orders: int = 0
+        self.market_data_cache_hits: int = 0
+        self.market_data_cache_misses: int = 0
 
-        self.STARTUP_DISK_SNAPSHOT: ModelSnapshot | None = self.reader.save_disk_snapshot()
+        self.STARTUP_DISK_SNAPSHOT: ModelSnapshot | IncrementalSnapshot | None = self._take_startup_snapshot()
         self._instance_is_valid: bool = True
 
 # ----------------------------------
@@ -84,50 +86,116 @@ class LIBBmodel:
             self._ensure_dir(dir)
 
         # portfolio files
-        self._ensure_file(self.layout.portfolio_history_path, "date,equity,cash,positions_value,daily_return_pct,overall_return_pct\n")
-        self._ensure_file(self.layout.pending_trades_path, '{"orders": []}')
+        create_table(self.layout.portfolio_history_path, TABLE_COLUMNS["portfolio_history"])
+        create_document(self.layout.pending_trades_path, {"orders": []})
 
-        self._ensure_file(self.layout.cash_path, json.dumps({"cash": self.passed_verified_config["starting_cash"]}) )
+        create_document(self.layout.cash_path, {"cash": self.passed_verified_config["starting_cash"]})
 
-        self._ensure_file(self.layout.portfolio_path, "ticker,shares,buy_price,cost_basis,stop_loss,market_price,market_value,unrealized_pnl\n")
-        self._ensure_file(self.layout.trade_log_path, "date,ticker,action,order_type,shares,limit_price,executed_price,stop_loss,cost_basis,PnL,rationale,confidence,status,reason\n")
-        self._ensure_file(self.layout.position_history_path, "date,ticker,shares,avg_cost,stop_loss,market_price,market_value,unrealized_pnl\n")
+        create_table(self.layout.portfolio_path, TABLE_COLUMNS["portfolio"])
+        create_table(self.layout.trade_log_path, TABLE_COLUMNS["trade_log"])
+        create_table(self.layout.position_history_path, TABLE_COLUMNS["position_history"])
 
-        # metrics files
-        self._ensure_file(self.layout.behavior_path, "[]")
-        self._ensure_file(self.layout.performance_path, "[]")
-        self._ensure_file(self.layout.sentiment_path, "[]")
+        # metrics files; runs created before JSON Lines keep their history in JSON arrays
+        for path in [self.layout.behavior_path, self.layout.performance_path, self.layout.sentiment_path]:
+            if migrate_json_records(path.with_suffix(".json"), path):
+                print(f"Migrated {path.with_suffix('.json').name} to {path.name}.")
+            self._ensure_file(path)
         self._ensure_file(self.layout.config_path, json.dumps(self.passed_verified_config))
         return
     
+    def _resolve_storage_backend(self) -> str:
+        """An existing run keeps the backend recorded in its config; convert it with `libb.core.storage.convert_run()`."""
+        config_path = self._root / "config.json"
+        if config_path.exists():
+            with open(config_path, "r") as f:
+                return json.load(f).get("storage_backend", "csv")
+        return self.passed_verified_config["storage_backend"]
+
+    # history artifacts, read from disk on first access (see the cached properties below)
+    _LAZY_STATE = ("portfolio_history", "trade_log", "position_history", "performance", "behavior", "sentiment")
+
     def _hydrate_from_disk(self) -> None:
-        "Match objects in memory from disk state."
-        self.portfolio: pd.DataFrame = self.reader.load_csv(self.layout.portfolio_path)
+        """
+        Match objects in memory from disk state.
+
+        Current state (portfolio, cash, config, pending trades) is loaded
+        now. The histories are loaded on first access, so construction does
+        not grow with the length of the run.
+        """
+        # processing adds tickers to the portfolio, so it keeps plain string columns
+        self.portfolio: pd.DataFrame = self.reader.load_typed(self.layout.portfolio_path, "portfolio", categories=False)
         self.cash: float = self.reader.load_cash()
-        self.portfolio_history: pd.DataFrame = self.reader.load_csv(self.layout.portfolio_history_path)
-        self.trade_log: pd.DataFrame = self.reader.load_csv(self.layout.trade_log_path)
-        self.position_history: pd.DataFrame = self.reader.load_csv(self.layout.position_history_path)
 
         self.CONFIG: dict = cast(dict, self.reader.load_json(self.layout.config_path))
         set_config(self.CONFIG)
         self.STARTING_CASH = self.CONFIG["starting_cash"]
 
         self.pending_trades: dict[str, list[dict]] = self.reader.load_orders_dict(self.layout.pending_trades_path)
-        self.performance: list[dict] = self.reader.load_json(self.layout.performance_path)
-        self.behavior: list[dict] = self.reader.load_json(self.layout.behavior_path)
-        self.sentiment: list[dict] = self.reader.load_json(self.layout.sentiment_path)
 
+        # drop histories cached from before a reset
+        for name in self._LAZY_STATE:
+            self.__dict__.pop(name, None)
+
+    @cached_property
+    def portfolio_history(self) -> pd.DataFrame:
+        return self.reader.load_typed(self.layout.portfolio_history_path, "portfolio_history")
+
+    @cached_property
+    def trade_log(self) -> pd.DataFrame:
+        return self.reader.load_typed(self.layout.trade_log_path, "trade_log")
+
+    @cached_property
+    def position_history(self) -> pd.DataFrame:
+        return self.reader.load_typed(self.layout.position_history_path, "position_history")
+
+    @cached_property
+    def performance(self) -> list[dict]:
+        return self.reader.load_records(self.layout.performance_path)
+
+    @cached_property
+    def behavior(self) -> list[dict]:
+        return self.reader.load_records(self.layout.behavior_path)
+
+    @cached_property
+    def sentiment(self) -> list[dict]:
+        return self.reader.load_records(self.layout.sentiment_path)
+
+    def _append_if_loaded(self, name: str, record: dict) -> None:
+        """Keep an already loaded history in step with disk without loading it just to append."""
+        if name in self.__dict__:
+            self.__dict__[name].append(record)
+
+
+    def _take_startup_snapshot(self) -> ModelSnapshot | IncrementalSnapshot | None:
+        """Snapshot used for rollback by the file backends. The sqlite backend rolls back its transaction instead."""
+        if self.layout.storage_backend == "sqlite":
+            return None
+        return self.reader.save_disk_snapshot()
 
     def _reset_runtime_state(self) -> None:
         self.filled_orders = 0
         self.failed_orders = 0
         self.skipped_orders = 0
+        self.market_data_cache_hits = 0
+        self.market_data_cache_misses = 0
         self.start_time = datetime.now(UTC)
         self.STARTUP_DISK_SNAPSHOT = None
 
     def _sync_config(self):
         disk_config = cast(dict, self.reader.load_json(self.layout.config_path))
-        if self.passed_verified_config is None or self.passed_verified_config == disk_config:
+        # runs created before storage backends were configurable are csv runs
+        disk_config.setdefault("storage_backend", "csv")
+        if self.passed_verified_config is None:
+            return
+
+        # the backend is fixed by the run on disk, so it never counts as a mismatch
+        disk_backend = disk_config["storage_backend"]
+        if self.passed_verified_config["storage_backend"] != disk_backend:
+            if self._requested_backend is not None:
+                print(f"Storage backend cannot change through config; keeping {disk_backend!r}. "
+                      "Use libb.core.storage.convert_run() to migrate the run.")
+            self.passed_verified_config["storage_backend"] = disk_backend
+        if self.passed_verified_config == disk_config:
             return
 
         if disk_config.get("locked", True):
@@ -191,7 +259,7 @@ class LIBBmodel:
             self.ensure_file_system()
             self._hydrate_from_disk()
             self._reset_runtime_state()
-            self.STARTUP_DISK_SNAPSHOT = self.reader.save_disk_snapshot()
+            self.STARTUP_DISK_SNAPSHOT = self._take_startup_snapshot()
             self._instance_is_valid = True
         return
 
@@ -218,7 +286,10 @@ class LIBBmodel:
                                           _portfolio_history_path=self.layout.portfolio_history_path,
                                         _portfolio_path=self.layout.portfolio_path, _model_path=self._model_path)
 
-        self.pending_trades = processing.processing(self.pending_trades)
+        try:
+            self.pending_trades = processing.processing(self.pending_trades)
+        finally:
+            self.market_data_cache_hits, self.market_data_cache_misses = processing.get_snapshot_cache_stats()
 
         self.filled_orders, self.failed_orders, self.skipped_orders = processing.get_order_status_count()
         self.portfolio = processing.get_portfolio()
@@ -259,11 +330,16 @@ class LIBBmodel:
 
         if is_nyse_open(self.run_date):
             try:
-                self._process()
-                self._save_new_logging_file()
+                # with the sqlite backend all ledger writes of the run commit together;
+                # file writes are fsynced individually and their directories once at the end
+                with commit_group(), transaction(self.layout.portfolio_path):
+                    self._process()
+                    self._save_new_logging_file()
             except Exception as e:
                 self._save_new_logging_file(status="FAILURE", error=e)
                 self._instance_is_valid = False
+                if self.layout.storage_backend == "sqlite":
+                    raise SystemError("Processing failed: the run's transaction was rolled back; disk state is unchanged.") from e
                 if self.STARTUP_DISK_SNAPSHOT is None:
                     raise RuntimeError("No startup disk snapshot available for rollback; disk may be corrupted.")
                 else:
@@ -333,6 +409,8 @@ class LIBBmodel:
             orders_processed=self.filled_orders,
             orders_failed=self.failed_orders,
             orders_skipped=self.skipped_orders,
+            market_data_cache_hits=self.market_data_cache_hits,
+            market_data_cache_misses=self.market_data_cache_misses,
             portfolio_value=portfolio_equity,
             error=str(error),
                 )
@@ -362,12 +440,15 @@ class LIBBmodel:
 # ----------------------------------
     
     def plot_equity_and_sentiment(self) -> None:
+        from libb.graphs.sentiment import plot_equity_and_sentiment
         return plot_equity_and_sentiment(self.layout.portfolio_history_path, self.layout.sentiment_path)
     
     def plot_equity_vs_baseline(self, baseline="^SPX"):
+        from libb.graphs.equity import plot_equity_vs_baseline
         return plot_equity_vs_baseline(self.layout.portfolio_history_path, baseline_ticker=baseline) 
     
     def plot_equity(self):
+        from libb.graphs.equity import plot_equity
         return plot_equity(self.layout.portfolio_history_path)
     
 
@@ -411,9 +492,10 @@ class LIBBmodel:
             - self.performance
             - self.layout.performance_path
         """
+        from libb.metrics.performance_metrics import total_performance_calculations
         performance_log = total_performance_calculations(self.layout.portfolio_history_path, self.layout.trade_log_path, self.run_date, baseline_ticker)
-        self.performance.append(performance_log)
-        self.writer.save_performance(self.performance)
+        self._append_if_loaded("performance", performance_log)
+        self.writer.append_performance(performance_log)
         return performance_log
     
     def generate_behavior_metrics(self) -> dict:
@@ -448,9 +530,10 @@ class LIBBmodel:
                 - self.behavior
                 - self.layout.behavior_path
         """
+        from libb.metrics.behavior_metrics import total_behavioral_metrics
         behavior_log = total_behavioral_metrics(self.layout.trade_log_path, self.layout.position_history_path, self.layout.portfolio_history_path, self.run_date)
-        self.behavior.append(behavior_log)
-        self.writer.save_behavior(self.behavior)
+        self._append_if_loaded("behavior", behavior_log)
+        self.writer.append_behavior(behavior_log)
         return behavior_log
     
     def analyze_sentiment(self, text: str, report_type: str="Unknown") -> dict:
@@ -482,9 +565,10 @@ class LIBBmodel:
             - self.sentiment
             - self.layout.sentiment_path
         """
+        from libb.metrics.sentiment_metrics import analyze_sentiment
         sentiment_log = analyze_sentiment(text, self.run_date, report_type=report_type)
-        self.sentiment.append(sentiment_log)
-        self.writer.save_sentiment(self.sentiment)
+        self._append_if_loaded("sentiment", sentiment_log)
+        self.writer.append_sentiment(sentiment_log)
         return sentiment_log
 
 # ----------------------------------
@@ -3,7 +3,8 @@ _CONFIG_TYPES = {
     "trading_days_per_year": int,
     "starting_cash": (float, int),
     "slippage_pct_per_trade": (float, int),
-    "locked": bool
+    "locked": bool,
+    "storage_backend": str,
 }
 
 _DEFAULT_CONFIG = {
@@ -11,7 +12,8 @@ _DEFAULT_CONFIG = {
     "trading_days_per_year": 252,
     "starting_cash": 10_000,
     "slippage_pct_per_trade": 0.0,
-    "locked": True
+    "locked": True,
+    "storage_backend": "csv",
 }
 
 def _is_valid_type(key: str, value) -> bool:
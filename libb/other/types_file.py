@@ -1,10 +1,14 @@
-from typing import TypedDict, Literal, Optional
+from typing import TypedDict, Literal, Optional, cast
+from collections.abc import Mapping
 from enum import Enum
 from dataclasses import dataclass
+import numpy as np
 import pandas as pd
 from copy import deepcopy
 import os
+from datetime import date
 from pathlib import Path
+from libb.core.storage import document_file_name, table_file_name
 
 class Order(TypedDict):
     action: Literal["b", "s", "u"]     # "u" = update stop-loss
@@ -40,9 +44,87 @@ class MarketHistoryObject(TypedDict):
      start_date: str
      end_date: str
 
+class CompactMarketHistory(Mapping):
+    """
+    Columnar stand-in for a MarketHistoryObject.
+
+    Open/High/Low/Close are held in one C-contiguous (4, n) array (float64
+    or float32), Volume in an int64 array, and all columns share one
+    DatetimeIndex. Indexing by key behaves like the dict form: the price and
+    volume keys return Series that are zero-copy views of the arrays, and
+    Ticker/start_date/end_date return strings.
+    """
+
+    PRICE_COLUMNS = ("Open", "High", "Low", "Close")
+    KEYS = ("Low", "High", "Close", "Open", "Volume", "Ticker", "start_date", "end_date")
+
+    __slots__ = ("ohlc", "volume", "index", "ticker", "start_date", "end_date", "_series")
+
+    def __init__(self, ohlc: np.ndarray, volume: np.ndarray, index: pd.DatetimeIndex,
+                 ticker: str, start_date: str, end_date: str):
+        if ohlc.shape != (4, len(index)) or volume.shape != (len(index),):
+            raise ValueError(f"Compact history for {ticker} has mismatched shapes: "
+                             f"ohlc {ohlc.shape}, volume {volume.shape}, index {len(index)}")
+        self.ohlc = np.ascontiguousarray(ohlc)
+        self.volume = np.ascontiguousarray(volume, dtype=np.int64)
+        self.index = index
+        self.ticker = ticker
+        self.start_date = start_date
+        self.end_date = end_date
+        self._series: dict[str, pd.Series] = {}
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, ticker: str, start_date, end_date,
+                   dtype: str = "float64") -> "CompactMarketHistory":
+        """Build from a frame with Open/High/Low/Close/Volume columns."""
+        ohlc = np.empty((4, len(df)), dtype=dtype)
+        for row, col in enumerate(cls.PRICE_COLUMNS):
+            ohlc[row] = df[col].to_numpy(dtype=dtype)
+        return cls(ohlc, df["Volume"].to_numpy(dtype=np.int64), pd.DatetimeIndex(df.index),
+                   ticker, str(start_date), str(end_date))
+
+    def __getitem__(self, key: str):
+        if key in self.PRICE_COLUMNS or key == "Volume":
+            series = self._series.get(key)
+            if series is None:
+                values = self.volume if key == "Volume" else self.ohlc[self.PRICE_COLUMNS.index(key)]
+                series = pd.Series(values, index=self.index, name=key, copy=False)
+                self._series[key] = series
+            return series
+        if key == "Ticker":
+            return self.ticker
+        if key == "start_date":
+            return self.start_date
+        if key == "end_date":
+            return self.end_date
+        raise KeyError(key)
+
+    def __iter__(self):
+        return iter(self.KEYS)
+
+    def __len__(self) -> int:
+        return len(self.KEYS)
+
+    def first_bar(self) -> MarketDataObject:
+        """The first bar as a MarketDataObject, read straight from the arrays."""
+        if self.ohlc.dtype == np.float32:
+            # shortest float32 repr, so 12.34 stays 12.34 rather than 12.340000152587891
+            open_, high, low, close = (float(str(value)) for value in self.ohlc[:, 0])
+        else:
+            open_, high, low, close = self.ohlc[:, 0].tolist()
+        return {
+            "Ticker": self.ticker,
+            "Low": low,
+            "High": high,
+            "Close": close,
+            "Open": open_,
+            "Volume": int(self.volume[0]),
+        }
+
 
 @dataclass (frozen=True)
 class ModelSnapshot:
+    """Full in-memory copy of the state processing writes. Metrics are not written during processing and are left out."""
     cash: float
 
     portfolio_history: pd.DataFrame
@@ -51,9 +133,6 @@ class ModelSnapshot:
     position_history: pd.DataFrame
 
     pending_trades: dict[str, list[dict]]
-    performance: list[dict]
-    behavior: list[dict]
-    sentiment: list[dict]
 
     def __post_init__(self):
         object.__setattr__(self, "portfolio_history", self.portfolio_history.copy(deep=True))
@@ -62,9 +141,22 @@ class ModelSnapshot:
         object.__setattr__(self, "position_history", self.position_history.copy(deep=True))
 
         object.__setattr__(self, "pending_trades", deepcopy(self.pending_trades))
-        object.__setattr__(self, "performance", deepcopy(self.performance))
-        object.__setattr__(self, "behavior", deepcopy(self.behavior))
-        object.__setattr__(self, "sentiment", deepcopy(self.sentiment))
+
+@dataclass(frozen=True)
+class IncrementalSnapshot:
+    """
+    Rollback point for runs whose ledger tables are CSV files.
+
+    The tables that processing only appends to are recorded by byte length
+    and truncated back to it on rollback. The small files processing
+    rewrites are copied byte for byte, with None for files that did not
+    exist. The cost does not grow with the length of the history.
+    """
+    file_contents: dict[Path, bytes | None]
+    file_lengths: dict[Path, int]
+
+class NoMarketDataError(ValueError):
+    """A data source answered but has no bars for the ticker or date range (unknown symbol, holiday, no local file)."""
 
 class TradeStatus(Enum):
     FILLED = "FILLED"
@@ -72,16 +164,82 @@ class TradeStatus(Enum):
     SKIPPED = "SKIPPED"
 
 
+def _env_float(name: str, default: float | None = None) -> float | None:
+    value = os.getenv(name)
+    if value is None or value == "":
+        return default
+    try:
+        return float(value)
+    except ValueError:
+        return default
+
+def _env_date(name: str) -> date | None:
+    value = os.getenv(name)
+    if not value:
+        return None
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        return None
+
+def _compact_history_dtype(value: str) -> Literal["float64", "float32"] | None:
+    value = value.strip().lower()
+    if value in {"1", "true", "yes", "float64"}:
+        return "float64"
+    if value == "float32":
+        return "float32"
+    return None
+
 @dataclass
 class MarketConfig:
     alpha_vantage_key: str | None = None
     finnhub_key: str | None = None
+    cache_dir: Path | None = None   # None disables on-disk market data caching
+    cache_max_age_days: float | None = 7.0   # cached bars older than this are re-downloaded; None keeps them
+    hedge_delay: float | None = None   # seconds before the next source is raced; None = sequential fallback
+    local_data_dir: Path | None = None   # directory of per-ticker CSV/Parquet files served before any network source
+    offline: bool = False   # disables network data sources and the on-disk market data cache
+    compact_history: Literal["float64", "float32"] | None = None   # return CompactMarketHistory with this price dtype
+
+    # HTTP client for Stooq, Finnhub and Alpha Vantage
+    http_connect_timeout: float = 5.0
+    http_read_timeout: float = 30.0
+    http_max_retries: int = 3
+    http_max_per_host: int = 4
+
+    # circuit breaker: skip a source for `circuit_cooldown` seconds after this many consecutive failures
+    circuit_failure_threshold: int = 3
+    circuit_cooldown: float = 300.0
+
+    # span of the precomputed NYSE trading calendar; None uses the defaults in libb.execution.trading_calendar
+    calendar_start: date | None = None
+    calendar_end: date | None = None
+    calendar_max_age_days: float = 7.0   # the saved calendar is rebuilt once it is older than this
 
     @classmethod
     def from_env(cls):
+        # on-disk caching is opt-in: unset or empty LIBB_CACHE_DIR writes nothing to disk
+        cache_dir = os.getenv("LIBB_CACHE_DIR")
+        resolved_cache_dir = Path(cache_dir).expanduser() if cache_dir else None
+        local_data_dir = os.getenv("LIBB_LOCAL_DATA_DIR")
         return cls(
             alpha_vantage_key=os.getenv("ALPHA_VANTAGE_API_KEY"),
             finnhub_key=os.getenv("FINNHUB_API_KEY"),
+            cache_dir=resolved_cache_dir,
+            cache_max_age_days=_env_float("LIBB_CACHE_MAX_AGE_DAYS", 7.0),
+            hedge_delay=_env_float("LIBB_HEDGE_DELAY"),
+            local_data_dir=Path(local_data_dir) if local_data_dir else None,
+            offline=os.getenv("LIBB_OFFLINE", "").strip().lower() in {"1", "true", "yes"},
+            compact_history=_compact_history_dtype(os.getenv("LIBB_COMPACT_HISTORY", "")),
+            http_connect_timeout=cast(float, _env_float("LIBB_HTTP_CONNECT_TIMEOUT", 5.0)),
+            http_read_timeout=cast(float, _env_float("LIBB_HTTP_READ_TIMEOUT", 30.0)),
+            http_max_retries=int(cast(float, _env_float("LIBB_HTTP_MAX_RETRIES", 3))),
+            http_max_per_host=int(cast(float, _env_float("LIBB_HTTP_MAX_PER_HOST", 4))),
+            circuit_failure_threshold=int(cast(float, _env_float("LIBB_CIRCUIT_FAILURE_THRESHOLD", 3))),
+            circuit_cooldown=cast(float, _env_float("LIBB_CIRCUIT_COOLDOWN", 300.0)),
+            calendar_start=_env_date("LIBB_CALENDAR_START"),
+            calendar_end=_env_date("LIBB_CALENDAR_END"),
+            calendar_max_age_days=cast(float, _env_float("LIBB_CALENDAR_MAX_AGE_DAYS", 7.0)),
         )
     
 @dataclass(slots=True)
@@ -97,6 +255,8 @@ class Log:
     orders_processed: int
     orders_failed: int
     orders_skipped: int
+    market_data_cache_hits: int
+    market_data_cache_misses: int
     portfolio_value: float
     error: str | Exception | None = None
 
@@ -123,7 +283,7 @@ class DiskLayout:
     pending_trades_path: Path
     cash_path: Path
 
-    # metrics files
+    # metrics files (JSON Lines, one record per line)
     performance_path: Path
     behavior_path: Path
     sentiment_path: Path
@@ -131,8 +291,11 @@ class DiskLayout:
     # config file
     config_path: Path
 
+    # format of the four portfolio tables, cash and pending trades (see libb.core.storage)
+    storage_backend: str = "csv"
+
     @classmethod
-    def from_root(cls, root: Path) -> "DiskLayout":
+    def from_root(cls, root: Path, storage_backend: str = "csv") -> "DiskLayout":
         portfolio_dir = root / "portfolio"
         metrics_dir = root / "metrics"
         research_dir = root / "research"
@@ -156,16 +319,18 @@ class DiskLayout:
             daily_reports_dir=daily_reports_dir,
             prompt_dir=prompt_dir,
 
-            portfolio_path=portfolio_dir / "portfolio.csv",
-            portfolio_history_path=portfolio_dir / "portfolio_history.csv",
-            trade_log_path=portfolio_dir / "trade_log.csv",
-            position_history_path=portfolio_dir / "position_history.csv",
-            pending_trades_path=portfolio_dir / "pending_trades.json",
-            cash_path=portfolio_dir / "cash.json",
+            portfolio_path=portfolio_dir / table_file_name("portfolio", storage_backend),
+            portfolio_history_path=portfolio_dir / table_file_name("portfolio_history", storage_backend),
+            trade_log_path=portfolio_dir / table_file_name("trade_log", storage_backend),
+            position_history_path=portfolio_dir / table_file_name("position_history", storage_backend),
+            pending_trades_path=portfolio_dir / document_file_name("pending_trades", storage_backend),
+            cash_path=portfolio_dir / document_file_name("cash", storage_backend),
+
+            performance_path=metrics_dir / "performance.jsonl",
+            behavior_path=metrics_dir / "behavior.jsonl",
+            sentiment_path=metrics_dir / "sentiment.jsonl",
 
-            performance_path=metrics_dir / "performance.json",
-            behavior_path=metrics_dir / "behavior.json",
-            sentiment_path=metrics_dir / "sentiment.json",
+            config_path=config_path,
 
-            config_path=config_path
+            storage_backend=storage_backend,
         )
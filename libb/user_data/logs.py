@@ -1,6 +1,7 @@
 from datetime import datetime, timedelta, date
 import pandas as pd
 from pathlib import Path
+from libb.core.storage import apply_table_schema, query_table
 
 def _recent_execution_logs(trade_log_path: str | Path, date: date | None = None, look_back: int = 5) -> pd.DataFrame:
     """
@@ -16,7 +17,7 @@ def _recent_execution_logs(trade_log_path: str | Path, date: date | None = None,
     Parameters
     ----------
     trade_log_path : str or pathlib.Path
-        Path to the trade execution log CSV file. The file must contain a
+        Path to the trade execution log (any storage backend). It must contain a
         column named "date".
 
     date : datetime.date or None, optional
@@ -46,6 +47,6 @@ def _recent_execution_logs(trade_log_path: str | Path, date: date | None = None,
     else:
         TODAY = pd.Timestamp(date).date() 
     time_range = TODAY - timedelta(days=look_back)
-    trade_log = pd.read_csv(trade_log_path)
+    trade_log = apply_table_schema(query_table(trade_log_path, start_date=time_range), "trade_log")
     trade_log["date"] = pd.to_datetime(trade_log["date"]).dt.date
     return trade_log[trade_log["date"] >= time_range]
\ No newline at end of file
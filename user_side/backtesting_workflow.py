@@ -1,6 +1,7 @@
 from libb import LIBBmodel
 from .prompt_orchestration.prompt_models import prompt_daily_report, prompt_deep_research
 from libb.other.parse import parse_json
+from libb.execution.utils import next_trading_day, trading_days_between
 import pandas as pd
 
 MODELS = ["deepseek", "gpt-4.1"]
@@ -40,18 +41,17 @@ def daily_flow(date):
 
 def main():
     start_date = pd.Timestamp("2026-01-23")
-    for i in range(20):
-        run_date = start_date + pd.Timedelta(days=i)    
-        day_num = run_date.weekday()
+    end_date = start_date + pd.Timedelta(days=19)
 
-        if day_num  == 4: # Friday
-            print("Friday: Running Weekly Flow...")
+    # only trading sessions: weekends and holidays never build a model
+    for run_date in trading_days_between(start_date, end_date):
+        # last session of the week (usually Friday, earlier before a holiday)
+        if next_trading_day(run_date).isocalendar().week != run_date.isocalendar().week:
+            print("End of Week: Running Weekly Flow...")
             weekly_flow(run_date)
-        elif day_num < 4:
-            print("Regular Weekday: Running Daily Flow...")
-            daily_flow(run_date) # Mon-Thursday
-        else:  # Weekend (optional, LIBB will automatically skip weekends)
-            print("Weekend: Skipping...")
+        else:
+            print("Regular Session: Running Daily Flow...")
+            daily_flow(run_date)
         print("Success!")
 
 